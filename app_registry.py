@@ -0,0 +1,118 @@
+import importlib
+import threading
+import time
+import settings
+
+# The apps the home screen can launch, and their loading.
+#
+# Nothing is imported until an app is opened (or warmed up), so heavy
+# dependencies such as torch only load for the app that needs them. Imported
+# modules are kept, so opening an app a second time is instant. warm_up()
+# imports an app on a background thread ahead of time.
+
+class AppSpec:
+    def __init__(self, app_index, name, module, icon=None, entry='run', heavy_dependencies=()):
+        self.app_index = app_index
+        self.name = name
+        self.module = module
+        self.icon = icon
+        self.entry = entry
+        self.heavy_dependencies = tuple(heavy_dependencies)
+
+    @property
+    def heavy(self):
+        return bool(self.heavy_dependencies)
+
+MANIFEST = [
+    AppSpec(1, 'Measure', 'apps.app_1', 'resources/app_1.jpg'),
+    AppSpec(2, 'Depth Scan', 'apps.app_2', 'resources/app_2.jpg', heavy_dependencies=('torch', 'transformers')),
+    AppSpec(3, 'Click Counter', 'apps.app_3', 'resources/app_3.jpg'),
+    AppSpec(4, 'Calculator', 'apps.app_4', 'resources/app_4.jpg'),
+    AppSpec(5, 'Text Editor', 'apps.app_5', 'resources/app_5.jpg'),
+]
+
+class AppRegistry:
+    def __init__(self, manifest=MANIFEST, warmup=settings.APP_WARMUP, warmup_heavy=settings.APP_WARMUP_HEAVY):
+        self.specs = {spec.app_index: spec for spec in manifest}
+        self.warmup = warmup
+        self.warmup_heavy = warmup_heavy
+        self.last_launched = None
+        self._modules = {}  # app_index -> imported module
+        self._loading = {}  # app_index -> Thread importing it
+        self._lock = threading.Lock()
+
+    def get(self, app_index):
+        return self.specs.get(app_index)
+
+    def is_loaded(self, app_index):
+        return app_index in self._modules
+
+    # Import the app's module (once); raises ModuleNotFoundError for apps that
+    # aren't in the manifest or can't be imported
+    def load(self, app_index):
+        module = self._modules.get(app_index)
+        if module is not None:
+            return module
+        spec = self.specs.get(app_index)
+        if spec is None:
+            raise ModuleNotFoundError(f"No app registered as {app_index}")
+        start = time.perf_counter()
+        module = importlib.import_module(spec.module)
+        with self._lock:
+            if app_index not in self._modules:
+                print(f"Loaded {spec.name} ({spec.module}) in {time.perf_counter() - start:.2f}s")
+            self._modules[app_index] = module
+        return module
+
+    # Entry point (run(screen, camera_manager)) of the app
+    def entry(self, app_index):
+        module = self.load(app_index)
+        self.last_launched = app_index
+        return getattr(module, self.specs[app_index].entry)
+
+    # Start importing the app on a background thread if it isn't loaded yet
+    def warm_up(self, app_index):
+        spec = self.specs.get(app_index)
+        if spec is None or app_index in self._modules:
+            return
+        if spec.heavy and not self.warmup_heavy:
+            return
+        with self._lock:
+            if app_index in self._loading:
+                return
+            thread = threading.Thread(target=self._warm_up, args=(app_index,), daemon=True)
+            self._loading[app_index] = thread
+        thread.start()
+
+    def _warm_up(self, app_index):
+        try:
+            self.load(app_index)
+        except Exception as e:
+            print(f"Could not warm up app {app_index}: {e}")
+
+    # Warm up whichever app is most likely to be opened next: the one opened
+    # last, or else the first one in the manifest
+    def warm_up_likely(self):
+        if not self.warmup:
+            return
+        if self.last_launched is not None:
+            self.warm_up(self.last_launched)
+        elif self.specs:
+            self.warm_up(min(self.specs))
+
+_registry = AppRegistry()
+
+def get(app_index):
+    return _registry.get(app_index)
+
+def load(app_index):
+    return _registry.load(app_index)
+
+def entry(app_index):
+    return _registry.entry(app_index)
+
+def warm_up(app_index):
+    _registry.warm_up(app_index)
+
+def warm_up_likely():
+    _registry.warm_up_likely()
@@ -1,9 +1,15 @@
 import pygame
 from pygame import mixer
 import sys
-import time
 import math
 from camera_manager import CameraManager
+import perf_stats
+import sound_engine
+from frame_scheduler import FrameScheduler
+from ui import Widget, Button, Cursor, RenderLayer
+from hit_test import HitIndex
+from gestures import GestureEngine, HOVER_ENTER, PINCH_START, PINCH_MOVE, PINCH_END
+import text_cache
 
 # Initialize Pygame
 pygame.init()
@@ -15,44 +21,91 @@ LIGHT_BLUE = (173, 216, 230)
 WHITE = (255, 255, 255)
 NAVY_BLUE = (20, 20, 40)
 PIXEL_TO_MM = 0.4478  # Adjust this variable as needed
-PINCH_RELEASE_DISTANCE = 60  # Distance to release the pinch
-PINCH_HOLD_TIME = 0.2  # Minimum time to hold the pinch before releasing
 
 def distance(p1, p2):
     return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
 
-def play_sound(file_path):
-    mixer.music.stop()
-    mixer.music.load(file_path)
-    mixer.music.play()
+def play_sound(file_path, priority=sound_engine.NORMAL):
+    sound_engine.play(file_path, priority)
 
-def draw_line_with_measurement(screen, start_point, end_point):
+def draw_line_with_measurement(screen, start_point, end_point, font):
     if start_point and end_point:
         pygame.draw.line(screen, LIGHT_BLUE, start_point, end_point, 2)
         pygame.draw.circle(screen, LIGHT_BLUE, start_point, 5)
         pygame.draw.circle(screen, LIGHT_BLUE, end_point, 5)
         mid_line_point = ((start_point[0] + end_point[0]) // 2, (start_point[1] + end_point[1]) // 2)
         line_length = distance(start_point, end_point) * PIXEL_TO_MM
-        font = pygame.font.Font(None, 28)  # Slightly smaller font
-        text_surface = font.render(f'{line_length:.2f} mm', True, WHITE)
+        text_surface = text_cache.render(f'{line_length:.2f} mm', font, WHITE)
         screen.blit(text_surface, mid_line_point)
 
+# A measured line as a widget, so it is only repainted when it changes
+class MeasuredLine(Widget):
+    def __init__(self, font, start_point=None, end_point=None):
+        self.font = font
+        self.start_point = None
+        self.end_point = None
+        super().__init__((0, 0, 0, 0))
+        self.set_points(start_point, end_point)
+
+    def set_points(self, start_point, end_point):
+        if (start_point, end_point) == (self.start_point, self.end_point):
+            return
+        self.start_point = start_point
+        self.end_point = end_point
+        self.visible = bool(start_point and end_point)
+        if self.visible:
+            # The line with its end dots, plus the length label at the midpoint
+            rect = pygame.Rect(start_point, (0, 0)).union(pygame.Rect(end_point, (0, 0))).inflate(12, 12)
+            mid_line_point = ((start_point[0] + end_point[0]) // 2, (start_point[1] + end_point[1]) // 2)
+            line_length = distance(start_point, end_point) * PIXEL_TO_MM
+            rect.union_ip(pygame.Rect(mid_line_point, self.font.size(f'{line_length:.2f} mm')))
+            self.rect = rect
+        self.dirty = True
+
+    def draw(self, surface):
+        draw_line_with_measurement(surface, self.start_point, self.end_point, self.font)
+
 def run(screen, camera_manager):
     running = True
-    drawing = False
+    drawing_hand = None  # Index of the hand whose pinch is drawing the current line
     start_point = None
     end_point = None
     permanent_lines = []
-    pinch_start_time = None
 
     home_button_center = (100, 70)  # Adjusted position for smaller screen
     home_button_radius = 30  # Smaller radius for smaller screen
 
     clear_button_rect = pygame.Rect((SCREEN_SIZE[0] // 2 - 100, SCREEN_SIZE[1] - 100, 200, 50))  # Adjusted size
 
+    font = text_cache.get_font(28)  # Adjusted font size
+
+    # Retained UI: pinch markers for up to two hands, the measured lines and the buttons
+    layer = RenderLayer(screen)
+    hand_markers = []
+    for _ in range(camera_manager.max_num_hands):
+        hand_markers.append(layer.add(Cursor(10, LIGHT_BLUE, 3),  # Pinch midpoint
+                                      Cursor(10, WHITE),         # Filled while pinching
+                                      Cursor(5, WHITE),          # Thumb tip
+                                      Cursor(5, WHITE)))         # Index finger tip
+    current_line = layer.add(MeasuredLine(font))
+    home_button = layer.add(Button.circle(home_button_center, home_button_radius, 'Home', font,
+                                          border_width=5))
+    clear_button = layer.add(Button(clear_button_rect, 'Clear', font, border_width=5, border_radius=15))
+    hit_index = HitIndex(SCREEN_SIZE)
+    hit_index.add_widget(home_button)
+    hit_index.add_widget(clear_button)
+    gestures = GestureEngine(hit_index, camera_manager.max_num_hands)
+    layer.add_overlay(perf_stats.draw_hud)
+
+    timer = perf_stats.frame_timer('app_1')
+    scheduler = FrameScheduler(camera_manager=camera_manager)
     while running:
+        timer.start()
         if not camera_manager.update():
+            if camera_manager.finished:
+                break  # The frame source ran out (file or replay input)
             continue
+        timer.lap('camera')
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -61,68 +114,50 @@ def run(screen, camera_manager):
                 camera_manager.release()
                 sys.exit()
 
-        screen.fill(BLACK)
-
         transformed_landmarks = camera_manager.get_transformed_landmarks()
-        if transformed_landmarks:
-            for hand_landmarks in transformed_landmarks:
-                thumb_pos = (int(hand_landmarks[4][0]), int(hand_landmarks[4][1]))  # THUMB_TIP
-                index_pos = (int(hand_landmarks[8][0]), int(hand_landmarks[8][1]))  # INDEX_FINGER_TIP
-
-                mid_point = ((thumb_pos[0] + index_pos[0]) // 2, (thumb_pos[1] + index_pos[1]) // 2)
-                pygame.draw.circle(screen, LIGHT_BLUE, mid_point, 10, 3)
-
-                pygame.draw.circle(screen, WHITE, thumb_pos, 5)
-                pygame.draw.circle(screen, WHITE, index_pos, 5)
-
-                distance_between_fingers = distance(thumb_pos, index_pos)
-                if distance_between_fingers < 50:  # Threshold for starting a pinch
-                    pygame.draw.circle(screen, WHITE, mid_point, 10)
-                    if not drawing:
-                        play_sound('audio/quick_click.wav')
-                        start_point = mid_point
-                        drawing = True
-                        pinch_start_time = time.time()
-                        play_sound('audio/drawing.wav')
-                    else:
-                        end_point = mid_point
-                else:
-                    if drawing and (distance_between_fingers > PINCH_RELEASE_DISTANCE or (time.time() - pinch_start_time) > PINCH_HOLD_TIME):
-                        if start_point and end_point:
-                            play_sound('audio/quick_click.wav')
-                            permanent_lines.append((start_point, end_point))
-                        drawing = False
-
-        for line in permanent_lines:
-            draw_line_with_measurement(screen, line[0], line[1])
-
-        if drawing and start_point and end_point:
-            draw_line_with_measurement(screen, start_point, end_point)
-
-        # Check if the cursor touches the home button or the clear button
-        if index_pos and distance(index_pos, home_button_center) <= home_button_radius:
-            running = False
-            play_sound('audio/back.wav')
-        elif index_pos and clear_button_rect.collidepoint(index_pos):
+        events = gestures.update(transformed_landmarks)
+        for hand, (mid_marker, pinch_marker, thumb_marker, index_marker) in zip(gestures.hands, hand_markers):
+            mid_marker.move(hand.pinch_pos)
+            pinch_marker.move(hand.pinch_pos if hand.pinching else None)  # Filled while pinching
+            thumb_marker.move(hand.thumb)
+            index_marker.move(hand.pos)
+
+        # One line at a time, drawn by whichever hand pinched first
+        for event in events:
+            if event.type == PINCH_START and drawing_hand is None:
+                play_sound('audio/quick_click.wav', sound_engine.LOW)
+                start_point = event.pos
+                end_point = None
+                drawing_hand = event.hand
+                play_sound('audio/drawing.wav')
+            elif event.type == PINCH_MOVE and event.hand == drawing_hand:
+                end_point = event.pos
+            elif event.type == PINCH_END and event.hand == drawing_hand:
+                if start_point and end_point:
+                    play_sound('audio/quick_click.wav', sound_engine.LOW)
+                    permanent_lines.append(layer.add(MeasuredLine(font, start_point, end_point), before=current_line))
+                drawing_hand = None
+            elif event.type == HOVER_ENTER and event.target is home_button:
+                running = False
+                play_sound('audio/back.wav', sound_engine.HIGH)
+
+        if drawing_hand is not None:
+            current_line.set_points(start_point, end_point)
+        else:
+            current_line.set_points(None, None)
+
+        # Clear while a finger is on the clear button
+        if clear_button in gestures.hovered():
+            for line in permanent_lines:
+                layer.remove(line)
             permanent_lines = []
 
-        # Draw home button
-        pygame.draw.circle(screen, NAVY_BLUE, home_button_center, home_button_radius)
-        pygame.draw.circle(screen, LIGHT_BLUE, home_button_center, home_button_radius, 5)
-        font = pygame.font.Font(None, 28)  # Adjusted font size
-        text_surface = font.render('Home', True, WHITE)
-        text_rect = text_surface.get_rect(center=home_button_center)
-        screen.blit(text_surface, text_rect)
-
-        # Draw clear button
-        pygame.draw.rect(screen, NAVY_BLUE, clear_button_rect, border_radius=15)
-        pygame.draw.rect(screen, LIGHT_BLUE, clear_button_rect, 5, border_radius=15)
-        text_surface = font.render('Clear', True, WHITE)
-        text_rect = text_surface.get_rect(center=clear_button_rect.center)
-        screen.blit(text_surface, text_rect)
-
-        pygame.display.flip()
-        pygame.time.delay(1)
+        timer.lap('input')
+        layer.present()
+        timer.lap('present')
+        scheduler.tick(active=transformed_landmarks is not None)
+        timer.lap('delay')
+        timer.stop()
 
 if __name__ == '__main__':
     screen = pygame.display.set_mode(SCREEN_SIZE)
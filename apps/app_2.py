@@ -1,12 +1,21 @@
 import pygame
 import cv2
 import numpy as np
-import torch
 from PIL import Image
-from datetime import datetime
-from transformers import AutoImageProcessor, AutoModelForDepthEstimation
 from pygame import mixer
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import perf_stats
+import settings
+import depth_model
+import scan_store
+import sound_engine
+from frame_scheduler import FrameScheduler
+from ui import ImageView, Panel, Button, Cursor, RenderLayer
+from hit_test import HitIndex
+from gestures import GestureEngine, HOVER_ENTER
+import text_cache
 
 # Initialize Pygame
 pygame.init()
@@ -19,36 +28,16 @@ NAVY_BLUE = (20, 20, 40)
 # Initialize the mixer
 mixer.init()
 
-# Initialize the model and processor
-checkpoint = "vinvino02/glpn-nyu"
-image_processor = AutoImageProcessor.from_pretrained(checkpoint)
-model = AutoModelForDepthEstimation.from_pretrained(checkpoint)
-
-def play_sound(file_path):
-    try:
-        mixer.music.load(file_path)
-        mixer.music.play()
-    except pygame.error as e:
-        print(f"Error playing sound {file_path}: {e}")
-
-def perform_depth_estimation(image):
-    pixel_values = image_processor(image, return_tensors="pt").pixel_values
-
-    with torch.no_grad():
-        outputs = model(pixel_values)
-        predicted_depth = outputs.predicted_depth
-
-    prediction = torch.nn.functional.interpolate(
-        predicted_depth.unsqueeze(1),
-        size=image.size[::-1],
-        mode="bicubic",
-        align_corners=False,
-    ).squeeze()
-    output = prediction.numpy()
+def play_sound(file_path, priority=sound_engine.NORMAL):
+    sound_engine.play(file_path, priority)
+
+def perform_depth_estimation(image, report=True):
+    output = depth_model.get_service().estimate(image)
 
     min_depth = np.min(output)
     max_depth = np.max(output)
-    print(f"Min depth: {min_depth}, Max depth: {max_depth}")
+    if report:
+        print(f"Min depth: {min_depth}, Max depth: {max_depth}")
 
     output_normalized = (output - min_depth) / (max_depth - min_depth)
     output_normalized = (output_normalized * 255).astype("uint8")
@@ -59,34 +48,150 @@ def perform_depth_estimation(image):
     depth_resized = cv2.resize(depth_cv, (image.width, image.height))
     depth_colored = cv2.applyColorMap(depth_resized, cv2.COLORMAP_JET)
 
+    # The raw depth goes along so scans keep their metric values
+    return depth_colored, depth_cv, output
+
+# Scans run one at a time on a worker thread so the UI and hand tracking keep going
+_scan_executor = None
+
+def get_scan_executor():
+    global _scan_executor
+    if _scan_executor is None:
+        _scan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='depth-scan')
+    return _scan_executor
+
+# Worker side of a scan: warp the camera frame onto the projected surface,
+# estimate depth and queue the result for saving
+def scan_frame(frame, M):
+    start = time.perf_counter()
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    frame_transformed = cv2.warpPerspective(frame_rgb, M, (SCREEN_SIZE[0], SCREEN_SIZE[1]))
+    image = Image.fromarray(frame_transformed)
+    depth_colored, depth_cv, depth = perform_depth_estimation(image)
+    perf_stats.get_stats('depth_scan').add('scan', time.perf_counter() - start)
+
+    scan_store.get_store().save(depth, preview=depth_cv, frame=frame, homography=M)
     return depth_colored, depth_cv
 
-def save_images(depth_map):
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    depth_map_path = f'./scans/depth_map_{timestamp}.png'
-    cv2.imwrite(depth_map_path, depth_map)
-    print(f"Saved depth map as {depth_map_path}")
+# Continuous depth overlay. Every frame update() checks whether a new estimate
+# is due (at most fps per second); if the downscaled warped frame has barely
+# changed since the last estimate, that result is reused instead of running
+# the model again. New results are blended into the previous ones so the
+# overlay changes smoothly.
+class LiveDepth:
+    def __init__(self, fps=settings.DEPTH_LIVE_FPS, size=depth_model.parse_size(settings.DEPTH_LIVE_SIZE),
+                 change_threshold=settings.DEPTH_LIVE_CHANGE, blend=settings.DEPTH_LIVE_BLEND):
+        self.interval = 1.0 / fps
+        self.size = size
+        self.change_threshold = change_threshold
+        self.blend = blend
+        self.enabled = False
+        self.depth = None  # Blended depth map (float, 0-255) at self.size
+        self.estimates = 0
+        self.reused = 0
+        self._future = None
+        self._last_submit = 0.0
+        self._last_thumbnail = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.depth = None
+        self._last_thumbnail = None
+
+    # Returns a new colored depth map (BGR, at self.size) when the overlay changed, else None
+    def update(self, camera_manager):
+        result = None
+        if self._future is not None and self._future.done():
+            future, self._future = self._future, None
+            try:
+                _, depth_cv, _ = future.result()
+            except Exception as e:
+                print(f"Live depth estimate failed: {e}")
+            else:
+                if self.enabled:
+                    result = self._blend(depth_cv)
+
+        now = time.monotonic()
+        if self.enabled and self._future is None and now - self._last_submit >= self.interval:
+            self._last_submit = now
+            warped = camera_manager.warped_frame
+            if warped is not None:
+                small = cv2.resize(warped, self.size, interpolation=cv2.INTER_AREA)
+                if self._changed(small):
+                    image = Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+                    self._future = get_scan_executor().submit(perform_depth_estimation, image, False)
+                    self.estimates += 1
+                else:
+                    self.reused += 1
+        return result
+
+    # Compare a small grayscale thumbnail with the one the last estimate ran on
+    def _changed(self, small):
+        thumbnail = cv2.resize(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (64, 48), interpolation=cv2.INTER_AREA)
+        if self._last_thumbnail is not None and self.depth is not None:
+            difference = cv2.absdiff(thumbnail, self._last_thumbnail).mean() / 255.0
+            if difference < self.change_threshold:
+                return False
+        self._last_thumbnail = thumbnail
+        return True
+
+    def _blend(self, depth_cv):
+        depth = depth_cv.astype(np.float32)
+        if self.depth is None:
+            self.depth = depth
+        else:
+            cv2.addWeighted(depth, self.blend, self.depth, 1.0 - self.blend, 0.0, dst=self.depth)
+        return cv2.applyColorMap(self.depth.astype(np.uint8), cv2.COLORMAP_JET)
 
 def run(screen, camera_manager):
     running = True
     depth_image = None
-    scanning = False
+    pending_scans = []  # Futures in submission order
 
     circle_radius = 55
     home_button_center = (35 + circle_radius, SCREEN_SIZE[1] - 35 - circle_radius)
     scan_button_rect = pygame.Rect((SCREEN_SIZE[0] // 2 - 140, SCREEN_SIZE[1] - 100, 280, 55))
-
-    font = pygame.font.Font(None, 28)
-
+    live_button_rect = pygame.Rect((SCREEN_SIZE[0] - 35 - 160, SCREEN_SIZE[1] - 100, 160, 55))
+    live = LiveDepth()
+
+    font = text_cache.get_font(28)
+
+    # Loads in the background (once per process); scanning waits until it's ready
+    model = depth_model.get_service()
+    model.start()
+
+    # Retained UI: the depth map only gets repainted when a new scan replaces it
+    layer = RenderLayer(screen)
+    depth_view = layer.add(ImageView((0, 0)))
+    # Sweeps down the screen while scans are pending
+    scan_line = layer.add(Panel((0, 0, SCREEN_SIZE[0], 5), WHITE))
+    scan_line.visible = False
+    layer.add(Panel((0, SCREEN_SIZE[1] - 150, SCREEN_SIZE[0], 150), BLACK))
+    scan_button = layer.add(Button(scan_button_rect, 'Start Scan', font, border_width=5, border_radius=15))
+    live_button = layer.add(Button(live_button_rect, 'Live: Off', font, border_width=5, border_radius=15))
+    home_button = layer.add(Button.circle(home_button_center, circle_radius, 'Home', font, border_width=5))
+    hit_index = HitIndex(SCREEN_SIZE)
+    hit_index.add_widget(scan_button)
+    hit_index.add_widget(live_button)
+    hit_index.add_widget(home_button)
+    gestures = GestureEngine(hit_index, camera_manager.max_num_hands)
+    cursor = layer.add(Cursor(10, LIGHT_BLUE, 3))
+    layer.add_overlay(perf_stats.draw_hud)
+
+    timer = perf_stats.frame_timer('app_2')
+    scheduler = FrameScheduler(camera_manager=camera_manager)
     while running:
+        timer.start()
         if not camera_manager.update():
+            if camera_manager.finished:
+                break  # The frame source ran out (file or replay input)
             continue
+        timer.lap('camera')
 
         transformed_landmarks = camera_manager.get_transformed_landmarks()
-        index_pos = None
-        if transformed_landmarks:
-            for hand_landmarks in transformed_landmarks:
-                index_pos = (int(hand_landmarks[8][0]), int(hand_landmarks[8][1]))  # INDEX_FINGER_TIP
+        # Buttons act once per touch, not on every frame the finger rests on them
+        touched = [event.target for event in gestures.update(transformed_landmarks)
+                   if event.type == HOVER_ENTER]
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -94,67 +199,71 @@ def run(screen, camera_manager):
                 pygame.quit()
                 sys.exit()
 
-        screen.fill(BLACK)
-
-        if index_pos:
-            if scan_button_rect.collidepoint(index_pos):
-                scanning = True
-                depth_image = None  # Clear the previous depth map
-
-                play_sound('audio/drawing.wav')
-
-                for y in range(0, SCREEN_SIZE[1], 20):
-                    screen.fill(BLACK)
-                    pygame.draw.line(screen, WHITE, (0, y), (SCREEN_SIZE[0], y), 5)
-                    pygame.display.flip()
-                    pygame.time.delay(10)
-
-                screen.fill(BLACK)
-                pygame.display.flip()
-
-                play_sound('audio/quick_click.wav')
-
-                ret, frame = camera_manager.cap.read()
+        if scan_button in touched and model.ready:
+            if len(pending_scans) < settings.DEPTH_MAX_PENDING:
+                ret, frame = camera_manager.read_frame()
                 if ret:
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frame_transformed = cv2.warpPerspective(frame_rgb, camera_manager.M, (SCREEN_SIZE[0], SCREEN_SIZE[1]))
-                    image = Image.fromarray(frame_transformed)
-                    depth_colored, depth_cv = perform_depth_estimation(image)
-
-                    save_images(depth_cv)
-
-                    depth_image = depth_colored
-
-                scanning = False
-
-            if (index_pos[0] - home_button_center[0])**2 + (index_pos[1] - home_button_center[1])**2 <= circle_radius**2:
-                running = False
-
-        if depth_image is not None:
+                    if not pending_scans:
+                        depth_image = None  # Clear the previous depth map
+                        depth_view.set_surface(None)
+                        scan_started = time.monotonic()
+                    play_sound('audio/drawing.wav')
+                    pending_scans.append(get_scan_executor().submit(scan_frame, frame, camera_manager.M))
+
+        if live_button in touched and model.ready:
+            live.toggle()
+            live_button.set_label('Live: On' if live.enabled else 'Live: Off')
+            play_sound('audio/quick_click.wav', sound_engine.LOW)
+            if not live.enabled:
+                depth_view.set_surface(None)
+
+        live_depth = live.update(camera_manager)
+        if live_depth is not None:
+            depth_surface = pygame.surfarray.make_surface(live_depth.transpose((1, 0, 2)))
+            depth_view.set_surface(pygame.transform.smoothscale(depth_surface, SCREEN_SIZE))
+
+        # Swap in finished scans, oldest first
+        while pending_scans and pending_scans[0].done():
+            future = pending_scans.pop(0)
+            try:
+                depth_colored, depth_cv = future.result()
+            except Exception as e:
+                print(f"Depth scan failed: {e}")
+                play_sound('audio/reject.wav', sound_engine.HIGH)
+                continue
+            play_sound('audio/quick_click.wav', sound_engine.LOW)
+            depth_image = depth_colored
             depth_surface = pygame.surfarray.make_surface(depth_image.transpose((1, 0, 2)))
-            depth_surface = pygame.transform.scale(depth_surface, (SCREEN_SIZE[0], SCREEN_SIZE[1]))
-            screen.blit(depth_surface, (0, 0))
-
-        pygame.draw.rect(screen, BLACK, (0, SCREEN_SIZE[1] - 150, SCREEN_SIZE[0], 150))
-
-        pygame.draw.rect(screen, NAVY_BLUE, scan_button_rect, border_radius=15)
-        pygame.draw.rect(screen, LIGHT_BLUE, scan_button_rect, 5, border_radius=15)
-        button_text = 'Scanning...' if scanning else 'Start Scan'
-        text_surface = font.render(button_text, True, WHITE)
-        text_rect = text_surface.get_rect(center=scan_button_rect.center)
-        screen.blit(text_surface, text_rect)
-
-        pygame.draw.circle(screen, NAVY_BLUE, home_button_center, circle_radius)
-        pygame.draw.circle(screen, LIGHT_BLUE, home_button_center, circle_radius, 5)
-        text_surface = font.render('Home', True, WHITE)
-        text_rect = text_surface.get_rect(center=home_button_center)
-        screen.blit(text_surface, text_rect)
-
-        if index_pos:
-            pygame.draw.circle(screen, LIGHT_BLUE, index_pos, 10, 3)
-
-        pygame.display.flip()
-        pygame.time.delay(1)
+            depth_view.set_surface(pygame.transform.scale(depth_surface, (SCREEN_SIZE[0], SCREEN_SIZE[1])))
+        timer.lap('scan')
+
+        if pending_scans:
+            # Same sweep as before: 20 px every 10 ms, over and over until done
+            y = int((time.monotonic() - scan_started) * 2000) % SCREEN_SIZE[1]
+            scan_line.set(rect=pygame.Rect(0, y, SCREEN_SIZE[0], 5))
+            scan_line.show(True)
+            label = 'Scanning...' if len(pending_scans) == 1 else f'Scanning... ({len(pending_scans)})'
+            scan_button.set_label(label)
+        else:
+            scan_line.show(False)
+            if model.state == depth_model.READY:
+                scan_button.set_label('Start Scan')
+            elif model.state == depth_model.FAILED:
+                scan_button.set_label('Model unavailable')
+            else:
+                scan_button.set_label('Warming up...')
+
+        if home_button in touched:
+            running = False
+
+        cursor.move(gestures.pointer())
+
+        timer.lap('input')
+        layer.present()
+        timer.lap('present')
+        scheduler.tick(active=transformed_landmarks is not None or bool(pending_scans) or live.enabled)
+        timer.lap('delay')
+        timer.stop()
 
 if __name__ == '__main__':
     from camera_manager import CameraManager  
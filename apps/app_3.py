@@ -1,8 +1,14 @@
 import pygame
 from pygame import mixer
 import sys
-import cv2
 from camera_manager import CameraManager
+import perf_stats
+import sound_engine
+from frame_scheduler import FrameScheduler
+from ui import Label, Button, Cursor, RenderLayer
+from hit_test import HitIndex
+from gestures import GestureEngine, HOVER_ENTER
+import text_cache
 
 # Initialize Pygame
 pygame.init()
@@ -15,12 +21,8 @@ WHITE = (255, 255, 255)
 LIGHT_BLUE = (173, 216, 230)
 NAVY_BLUE = (20, 20, 40)
 
-def play_sound(file_path):
-    try:
-        mixer.music.load(file_path)
-        mixer.music.play()
-    except pygame.error as e:
-        print(f"Error playing sound {file_path}: {e}")
+def play_sound(file_path, priority=sound_engine.NORMAL):
+    sound_engine.play(file_path, priority)
 
 def run(screen, camera_manager):
     running = True
@@ -31,64 +33,68 @@ def run(screen, camera_manager):
     reset_button_center = (SCREEN_SIZE[0] // 2 + 150, SCREEN_SIZE[1] // 2)
     home_button_center = (40 + circle_radius, SCREEN_SIZE[1] - 40 - circle_radius)
 
-    font = pygame.font.Font(None, 30)
-    large_font = pygame.font.Font(None, 60)
-
+    font = text_cache.get_font(30)
+    large_font = text_cache.get_font(60)
+
+    # Retained UI: only the count label and the finger markers change per frame
+    layer = RenderLayer(screen)
+    increase_button, reset_button, home_button = layer.add(
+        Button.circle(increase_button_center, circle_radius, 'Increase', font, border_width=5),
+        Button.circle(reset_button_center, circle_radius, 'Reset', font, border_width=5),
+        Button.circle(home_button_center, circle_radius, 'Home', font, border_width=5))
+    count_label = layer.add(Label((SCREEN_SIZE[0] // 2, SCREEN_SIZE[1] // 2 - 250), f'Count: {count}', large_font))
+    finger_markers = [layer.add(Cursor(5, LIGHT_BLUE)) for _ in range(camera_manager.max_num_hands)]
+    layer.add_overlay(perf_stats.draw_hud)
+
+    hit_index = HitIndex(SCREEN_SIZE)
+    for button in (increase_button, reset_button, home_button):
+        hit_index.add_widget(button)
+    gestures = GestureEngine(hit_index, camera_manager.max_num_hands)
+
+    timer = perf_stats.frame_timer('app_3')
+    scheduler = FrameScheduler(camera_manager=camera_manager)
     while running:
+        timer.start()
         if not camera_manager.update():
+            if camera_manager.finished:
+                break  # The frame source ran out (file or replay input)
             continue
+        timer.lap('camera')
 
         transformed_landmarks = camera_manager.get_transformed_landmarks()
-        if transformed_landmarks:
-            for hand_landmarks in transformed_landmarks:
-                index_pos = (int(hand_landmarks[8][0]), int(hand_landmarks[8][1]))  # INDEX_FINGER_TIP
-
-                # Draw the index finger point in LIGHT_BLUE
-                pygame.draw.circle(screen, LIGHT_BLUE, index_pos, 5)
-
-                if (index_pos[0] - increase_button_center[0])**2 + (index_pos[1] - increase_button_center[1])**2 <= circle_radius**2:
-                    play_sound('audio/quick_click.wav')
-                    count += 1
-                elif (index_pos[0] - reset_button_center[0])**2 + (index_pos[1] - reset_button_center[1])**2 <= circle_radius**2:
-                    play_sound('audio/confirmation.wav')
-                    count = 0
-                elif (index_pos[0] - home_button_center[0])**2 + (index_pos[1] - home_button_center[1])**2 <= circle_radius**2:
-                    play_sound('audio/back.wav')
-                    running = False
-
-        screen.fill(BLACK)
-
-        pygame.draw.circle(screen, NAVY_BLUE, increase_button_center, circle_radius)
-        pygame.draw.circle(screen, LIGHT_BLUE, increase_button_center, circle_radius, 5)
-        text_surface = font.render('Increase', True, WHITE)
-        text_rect = text_surface.get_rect(center=increase_button_center)
-        screen.blit(text_surface, text_rect)
-
-        pygame.draw.circle(screen, NAVY_BLUE, reset_button_center, circle_radius)
-        pygame.draw.circle(screen, LIGHT_BLUE, reset_button_center, circle_radius, 5)
-        text_surface = font.render('Reset', True, WHITE)
-        text_rect = text_surface.get_rect(center=reset_button_center)
-        screen.blit(text_surface, text_rect)
-
-        pygame.draw.circle(screen, NAVY_BLUE, home_button_center, circle_radius)
-        pygame.draw.circle(screen, LIGHT_BLUE, home_button_center, circle_radius, 5)
-        text_surface = font.render('Home', True, WHITE)
-        text_rect = text_surface.get_rect(center=home_button_center)
-        screen.blit(text_surface, text_rect)
-
-        count_surface = large_font.render(f'Count: {count}', True, WHITE)
-        count_rect = count_surface.get_rect(center=(SCREEN_SIZE[0] // 2, SCREEN_SIZE[1] // 2 - 250))
-        screen.blit(count_surface, count_rect)
-
-        pygame.display.flip()
-        pygame.time.delay(50)
+        events = gestures.update(transformed_landmarks)
+
+        # Draw the index finger points in LIGHT_BLUE
+        for hand, marker in zip(gestures.hands, finger_markers):
+            marker.move(hand.pos)
+
+        # Each touch of a button counts once
+        for event in events:
+            if event.type != HOVER_ENTER:
+                continue
+            if event.target is increase_button:
+                play_sound('audio/quick_click.wav', sound_engine.LOW)
+                count += 1
+            elif event.target is reset_button:
+                play_sound('audio/confirmation.wav', sound_engine.HIGH)
+                count = 0
+            elif event.target is home_button:
+                play_sound('audio/back.wav', sound_engine.HIGH)
+                running = False
+
+        count_label.set_text(f'Count: {count}')
+
+        timer.lap('input')
+        layer.present()
+        timer.lap('present')
+        scheduler.tick(active=transformed_landmarks is not None)
+        timer.lap('delay')
+        timer.stop()
 
         # Break out of loop if 'q' is pressed
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        if camera_manager.last_key == ord('q'):
             running = False
 
-    cv2.destroyAllWindows()
-
 if __name__ == '__main__':
     screen = pygame.display.set_mode(SCREEN_SIZE)
     pygame.display.set_caption('Click Counter App')
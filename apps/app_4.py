@@ -1,8 +1,13 @@
 import pygame
 from pygame import mixer
-import time
-import cv2
 from camera_manager import CameraManager
+import perf_stats
+import sound_engine
+from frame_scheduler import FrameScheduler
+from ui import Label, Button, Cursor, RenderLayer
+from hit_test import HitIndex
+from gestures import GestureEngine, TAP
+import text_cache
 
 def run(screen, camera_manager):
     # Initialize Pygame and mixer
@@ -11,26 +16,15 @@ def run(screen, camera_manager):
     
 
     SCREEN_SIZE = (1024, 768)
-    BLACK = (0, 0, 0)
-    WHITE = (255, 255, 255)
-    LIGHT_BLUE = (173, 216, 230)
-    NAVY_BLUE = (20, 20, 40)
     RED = (255, 0, 0)
 
-    def play_sound(file_path):
-        try:
-            mixer.music.load(file_path)
-            mixer.music.play()
-        except pygame.error as e:
-            print(f"Error playing sound {file_path}: {e}")
+    def play_sound(file_path, priority=sound_engine.NORMAL):
+        sound_engine.play(file_path, priority)
 
     running = True
     current_number = ""
     operation = None
     result = 0
-    index_pos = None
-    last_button_press = 0
-    button_cooldown = 0.5  # Cooldown time in seconds
 
     button_size = 80
     button_margin = 20
@@ -53,38 +47,50 @@ def run(screen, camera_manager):
     # Add exit button
     exit_button_rect = pygame.Rect(SCREEN_SIZE[0] - 100, 40, 80, 40)
 
-    font = pygame.font.Font(None, 36)
-    large_font = pygame.font.Font(None, 72)
-
+    font = text_cache.get_font(36)
+    large_font = text_cache.get_font(72)
+
+    # Retained UI: the keypad is drawn once; the display, operation and
+    # pointer are repainted only when they change
+    layer = RenderLayer(screen)
+    display_label = layer.add(Label((SCREEN_SIZE[0] // 2, 150), str(result), large_font))
+    operation_label = layer.add(Label((SCREEN_SIZE[0] // 2, 220), '', font))
+    operation_label.visible = False
+    hit_index = HitIndex(SCREEN_SIZE)
+    for button, rect in button_rects.items():
+        hit_index.add_widget(layer.add(Button(rect, button, font)), button)
+    exit_button = layer.add(Button(exit_button_rect, 'Exit', font))
+    hit_index.add_widget(exit_button)
+    pointer = layer.add(Cursor(10, RED))
+    # A button is pressed when the finger slides off it (a tap)
+    gestures = GestureEngine(hit_index, camera_manager.max_num_hands)
+    layer.add_overlay(perf_stats.draw_hud)
+
+    timer = perf_stats.frame_timer('app_4')
+    scheduler = FrameScheduler(camera_manager=camera_manager)
     while running:
+        timer.start()
         if not camera_manager.update():
+            if camera_manager.finished:
+                break  # The frame source ran out (file or replay input)
             continue
+        timer.lap('camera')
 
-        current_time = time.time()
         button_pressed = None
 
         transformed_landmarks = camera_manager.get_transformed_landmarks()
-        if transformed_landmarks:
-            for hand_landmarks in transformed_landmarks:
-                new_index_pos = (int(hand_landmarks[8][0]), int(hand_landmarks[8][1]))  # INDEX_FINGER_TIP
-
-                if index_pos is None:  # Finger just entered
-                    index_pos = new_index_pos
-                elif index_pos != new_index_pos:  # Finger moved
-                    for button, rect in button_rects.items():
-                        if rect.collidepoint(index_pos) and not rect.collidepoint(new_index_pos):
-                            if current_time - last_button_press > button_cooldown:
-                                button_pressed = button
-                                last_button_press = current_time
-                                play_sound('./audio/quick_click.wav')
-                    
-                    # Check for exit button
-                    if exit_button_rect.collidepoint(index_pos) and not exit_button_rect.collidepoint(new_index_pos):
-                        if current_time - last_button_press > button_cooldown:
-                            play_sound('./audio/back.wav')
-                            return  # Exit the calculator app
-                    
-                    index_pos = new_index_pos
+        for event in gestures.update(transformed_landmarks):
+            if event.type != TAP:
+                continue
+            tapped = event.target
+            if tapped in button_rects:
+                button_pressed = tapped
+                play_sound('./audio/quick_click.wav', sound_engine.LOW)
+
+            # Check for exit button
+            if tapped is exit_button:
+                play_sound('./audio/back.wav', sound_engine.HIGH)
+                return  # Exit the calculator app
 
         if button_pressed:
             if button_pressed.isdigit():
@@ -107,41 +113,24 @@ def run(screen, camera_manager):
                     current_number = str(result)
                     operation = None
 
-        screen.fill(BLACK)
-
-        # Draw calculator display
+        # Update calculator display
         display_text = current_number if current_number else str(result)
-        text_surface = large_font.render(display_text, True, WHITE)
-        text_rect = text_surface.get_rect(center=(SCREEN_SIZE[0] // 2, 150))
-        screen.blit(text_surface, text_rect)
+        display_label.set_text(display_text)
 
-        # Draw current operation
+        # Update current operation
         if operation:
-            op_surface = font.render(f"Operation: {operation}", True, WHITE)
-            op_rect = op_surface.get_rect(center=(SCREEN_SIZE[0] // 2, 220))
-            screen.blit(op_surface, op_rect)
-
-        # Draw buttons
-        for button, rect in button_rects.items():
-            pygame.draw.rect(screen, NAVY_BLUE, rect)
-            pygame.draw.rect(screen, LIGHT_BLUE, rect, 2)
-            text_surface = font.render(button, True, WHITE)
-            text_rect = text_surface.get_rect(center=rect.center)
-            screen.blit(text_surface, text_rect)
-
-        # Draw exit button
-        pygame.draw.rect(screen, NAVY_BLUE, exit_button_rect)
-        pygame.draw.rect(screen, LIGHT_BLUE, exit_button_rect, 2)
-        exit_text = font.render("Exit", True, WHITE)
-        exit_text_rect = exit_text.get_rect(center=exit_button_rect.center)
-        screen.blit(exit_text, exit_text_rect)
-
-        # Draw index finger pointer
-        if index_pos:
-            pygame.draw.circle(screen, RED, index_pos, 10)
-
-        pygame.display.flip()
-        pygame.time.delay(50)
+            operation_label.set_text(f"Operation: {operation}")
+        operation_label.show(bool(operation))
+
+        # Move index finger pointer
+        pointer.move(gestures.pointer())
+
+        timer.lap('input')
+        layer.present()
+        timer.lap('present')
+        scheduler.tick(active=transformed_landmarks is not None)
+        timer.lap('delay')
+        timer.stop()
 
         # Display camera frame using OpenCV
         # frame = camera_manager.frame
@@ -149,11 +138,9 @@ def run(screen, camera_manager):
         #     cv2.imshow("Camera View", frame)
         
         # Break out of loop if 'q' is pressed
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        if camera_manager.last_key == ord('q'):
             running = False
 
-    cv2.destroyAllWindows()
-
 if __name__ == '__main__':
     pygame.init()
     screen = pygame.display.set_mode((1024, 768))
@@ -3,6 +3,13 @@ from pygame import mixer
 import time
 import os
 from camera_manager import CameraManager
+import perf_stats
+import sound_engine
+from frame_scheduler import FrameScheduler
+from ui import Label, TextBlock, Button, Cursor, RenderLayer
+from hit_test import HitIndex
+from gestures import GestureEngine, TAP
+import text_cache
 
 
 def run(screen, camera_manager):
@@ -10,19 +17,11 @@ def run(screen, camera_manager):
     mixer.init()
 
     SCREEN_SIZE = (1024, 768)
-    BLACK = (0, 0, 0)
-    WHITE = (255, 255, 255)
-    LIGHT_BLUE = (173, 216, 230)
-    NAVY_BLUE = (20, 20, 40)
     RED = (255, 0, 0)
     GREEN = (0, 255, 0)
 
-    def play_sound(file_path):
-        try:
-            mixer.music.load(file_path)
-            mixer.music.play()
-        except pygame.error as e:
-            print(f"Error playing sound {file_path}: {e}")
+    def play_sound(file_path, priority=sound_engine.NORMAL):
+        sound_engine.play(file_path, priority)
 
     def save_text_to_file(text, filename):
         if not os.path.exists('saved_texts'):
@@ -35,9 +34,6 @@ def run(screen, camera_manager):
     running = True
     text = ""
     filename = ""
-    index_pos = None
-    last_button_press = 0
-    button_cooldown = 0.5  # Cooldown time in seconds
 
     button_size = 60
     button_margin = 5
@@ -99,65 +95,80 @@ def run(screen, camera_manager):
         40                          # Height
     )
 
-    font = pygame.font.Font(None, 36)
-    large_font = pygame.font.Font(None, 48)
+    font = text_cache.get_font(36)
+    large_font = text_cache.get_font(48)
 
     save_message = ""
     save_message_time = 0
     is_saving = False
 
+    # Retained UI: the keyboard is drawn once; the text, the save dialog and
+    # the pointer are repainted only when they change
+    layer = RenderLayer(screen)
+    text_block = layer.add(TextBlock(SCREEN_SIZE[0] // 2, 50, large_font, 50))
+    hit_index = HitIndex(SCREEN_SIZE)
+    for key, rect in button_rects.items():
+        hit_index.add_widget(layer.add(Button(rect, key, font)), key)
+    exit_button, save_button = layer.add(Button(exit_button_rect, 'Exit', font),
+                                         Button(save_button_rect, 'Save', font))
+    message_label = layer.add(Label((SCREEN_SIZE[0] // 2, 20), save_message, font, GREEN))
+    save_dialog = layer.add(Button(filename_input_rect, filename, font),
+                            Button(save_confirm_rect, 'Save', font),
+                            Button(cancel_rect, 'Cancel', font))
+    filename_input, save_confirm_button, cancel_button = save_dialog
+    for button in (exit_button, save_button, save_confirm_button, cancel_button):
+        hit_index.add_widget(button)
+    pointer = layer.add(Cursor(10, RED))
+    # A button is pressed when the finger slides off it (a tap)
+    gestures = GestureEngine(hit_index, camera_manager.max_num_hands)
+    layer.add_overlay(perf_stats.draw_hud)
+
+    timer = perf_stats.frame_timer('app_5')
+    scheduler = FrameScheduler(camera_manager=camera_manager)
     while running:
+        timer.start()
         if not camera_manager.update():
+            if camera_manager.finished:
+                break  # The frame source ran out (file or replay input)
             continue
+        timer.lap('camera')
 
         current_time = time.time()
         button_pressed = None
 
         transformed_landmarks = camera_manager.get_transformed_landmarks()
-        if transformed_landmarks:
-            for hand_landmarks in transformed_landmarks:
-                new_index_pos = (int(hand_landmarks[8][0]), int(hand_landmarks[8][1]))  # INDEX_FINGER_TIP
-
-                if index_pos is None:  # Finger just entered
-                    index_pos = new_index_pos
-                elif index_pos != new_index_pos:  # Finger moved
-                    for key, rect in button_rects.items():
-                        if rect.collidepoint(index_pos) and not rect.collidepoint(new_index_pos):
-                            if current_time - last_button_press > button_cooldown:
-                                button_pressed = key
-                                last_button_press = current_time
-                                play_sound('./audio/quick_click.wav')
-                    
-                    # Check for exit button
-                    if exit_button_rect.collidepoint(index_pos) and not exit_button_rect.collidepoint(new_index_pos):
-                        if current_time - last_button_press > button_cooldown:
-                            play_sound('./audio/back.wav')
-                            return  # Exit the text editor app
-                    
-                    # Check for save button
-                    if save_button_rect.collidepoint(index_pos) and not save_button_rect.collidepoint(new_index_pos):
-                        if current_time - last_button_press > button_cooldown:
-                            is_saving = True
-                            filename = ""
-                            play_sound('./audio/save.wav')  # You'll need to add this sound file
-                    
-                    # Check for save confirm button
-                    if is_saving and save_confirm_rect.collidepoint(index_pos) and not save_confirm_rect.collidepoint(new_index_pos):
-                        if current_time - last_button_press > button_cooldown:
-                            if filename:
-                                full_filename = save_text_to_file(text, filename)
-                                save_message = f"Saved to {full_filename}"
-                                save_message_time = current_time
-                                is_saving = False
-                                play_sound('./audio/save.wav')
-                    
-                    # Check for cancel button
-                    if is_saving and cancel_rect.collidepoint(index_pos) and not cancel_rect.collidepoint(new_index_pos):
-                        if current_time - last_button_press > button_cooldown:
-                            is_saving = False
-                            play_sound('./audio/back.wav')
-                    
-                    index_pos = new_index_pos
+        for event in gestures.update(transformed_landmarks):
+            if event.type != TAP:
+                continue
+            tapped = event.target
+            if tapped in button_rects:
+                button_pressed = tapped
+                play_sound('./audio/quick_click.wav', sound_engine.LOW)
+
+            # Check for exit button
+            if tapped is exit_button:
+                play_sound('./audio/back.wav', sound_engine.HIGH)
+                return  # Exit the text editor app
+
+            # Check for save button
+            if tapped is save_button:
+                is_saving = True
+                filename = ""
+                play_sound('./audio/save.wav')  # You'll need to add this sound file
+
+            # Check for save confirm button
+            if is_saving and tapped is save_confirm_button:
+                if filename:
+                    full_filename = save_text_to_file(text, filename)
+                    save_message = f"Saved to {full_filename}"
+                    save_message_time = current_time
+                    is_saving = False
+                    play_sound('./audio/save.wav')
+
+            # Check for cancel button
+            if is_saving and tapped is cancel_button:
+                is_saving = False
+                play_sound('./audio/back.wav', sound_engine.HIGH)
 
         if button_pressed:
             if is_saving:
@@ -175,77 +186,27 @@ def run(screen, camera_manager):
                 else:
                     text += button_pressed
 
-        screen.fill(BLACK)
-
-        # Get and display camera frame
-        # frame = camera_manager.get_frame()
-        # if frame is not None:
-        #     frame_surface = pygame.surfarray.make_surface(frame)
-        #     screen.blit(frame_surface, (0, 0))
-
-        # Draw text area
-        text_lines = text.split('\n')
-        text_y = 50
-        for line in text_lines:
-            text_surface = large_font.render(line, True, WHITE)
-            text_rect = text_surface.get_rect(center=(SCREEN_SIZE[0] // 2, text_y))
-            screen.blit(text_surface, text_rect)
-            text_y += 50
-
-        # Draw keyboard
-        for key, rect in button_rects.items():
-            pygame.draw.rect(screen, NAVY_BLUE, rect)
-            pygame.draw.rect(screen, LIGHT_BLUE, rect, 2)
-            key_text = font.render(key, True, WHITE)
-            key_rect = key_text.get_rect(center=rect.center)
-            screen.blit(key_text, key_rect)
-
-        # Draw exit button
-        pygame.draw.rect(screen, NAVY_BLUE, exit_button_rect)
-        pygame.draw.rect(screen, LIGHT_BLUE, exit_button_rect, 2)
-        exit_text = font.render("Exit", True, WHITE)
-        exit_text_rect = exit_text.get_rect(center=exit_button_rect.center)
-        screen.blit(exit_text, exit_text_rect)
-
-        # Draw save button
-        pygame.draw.rect(screen, NAVY_BLUE, save_button_rect)
-        pygame.draw.rect(screen, LIGHT_BLUE, save_button_rect, 2)
-        save_button_text = font.render("Save", True, WHITE)
-        save_button_text_rect = save_button_text.get_rect(center=save_button_rect.center)
-        screen.blit(save_button_text, save_button_text_rect)
-
-        # Display save message
-        if not is_saving and current_time - save_message_time < 3:  # Display message for 3 seconds
-            message_surface = font.render(save_message, True, GREEN)
-            message_rect = message_surface.get_rect(center=(SCREEN_SIZE[0] // 2, 20))
-            screen.blit(message_surface, message_rect)
-
-        # Draw filename input area and buttons when saving
-        if is_saving:
-            pygame.draw.rect(screen, NAVY_BLUE, filename_input_rect)
-            pygame.draw.rect(screen, LIGHT_BLUE, filename_input_rect, 2)
-            filename_text = font.render(filename, True, WHITE)
-            filename_text_rect = filename_text.get_rect(center=filename_input_rect.center)
-            screen.blit(filename_text, filename_text_rect)
-
-            pygame.draw.rect(screen, NAVY_BLUE, save_confirm_rect)
-            pygame.draw.rect(screen, LIGHT_BLUE, save_confirm_rect, 2)
-            save_confirm_text = font.render("Save", True, WHITE)
-            save_confirm_text_rect = save_confirm_text.get_rect(center=save_confirm_rect.center)
-            screen.blit(save_confirm_text, save_confirm_text_rect)
-
-            pygame.draw.rect(screen, NAVY_BLUE, cancel_rect)
-            pygame.draw.rect(screen, LIGHT_BLUE, cancel_rect, 2)
-            cancel_text = font.render("Cancel", True, WHITE)
-            cancel_text_rect = cancel_text.get_rect(center=cancel_rect.center)
-            screen.blit(cancel_text, cancel_text_rect)
-
-        # Draw index finger pointer
-        if index_pos:
-            pygame.draw.circle(screen, RED, index_pos, 10)
-
-        pygame.display.flip()
-        pygame.time.delay(50)
+        # Update text area
+        text_block.set_text(text)
+
+        # Show save message for 3 seconds
+        message_label.set_text(save_message)
+        message_label.show(not is_saving and current_time - save_message_time < 3)
+
+        # Show filename input area and buttons when saving
+        filename_input.set_label(filename)
+        for widget in save_dialog:
+            widget.show(is_saving)
+
+        # Move index finger pointer
+        pointer.move(gestures.pointer())
+
+        timer.lap('input')
+        layer.present()
+        timer.lap('present')
+        scheduler.tick(active=transformed_landmarks is not None)
+        timer.lap('delay')
+        timer.stop()
 
 if __name__ == '__main__':
     # This block is for testing the text editor app independently
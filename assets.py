@@ -0,0 +1,135 @@
+import os
+import threading
+import pygame
+from pygame import mixer
+
+# Images and sounds loaded once and kept in memory.
+#
+# Images are converted to the display's pixel format (convert()/convert_alpha())
+# the first time they are requested after the display exists, so blitting
+# them needs no per-frame conversion. Sounds are decoded into mixer.Sound
+# objects, so playing one (see sound_engine) never touches the disk.
+# prefetch() does the disk I/O and decoding for a list of files on a
+# background thread at startup.
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+SOUND_EXTENSIONS = ('.wav', '.ogg')
+
+class AssetManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._raw_images = {}  # path -> surface as loaded from disk
+        self._images = {}  # (path, size) -> converted (and scaled) surface
+        self._sounds = {}  # path -> mixer.Sound
+        self._missing = set()
+        self._prefetch_thread = None
+
+    # Same file, same key, however the path was spelled ('./audio/x.wav' vs 'audio/x.wav')
+    def _key(self, path):
+        return os.path.normpath(path)
+
+    def _report_missing(self, path, error):
+        with self._lock:
+            if path in self._missing:
+                return
+            self._missing.add(path)
+        print(f"Could not load asset {path}: {error}")
+
+    def _load_raw_image(self, path):
+        with self._lock:
+            surface = self._raw_images.get(path)
+        if surface is None and path not in self._missing:
+            try:
+                surface = pygame.image.load(path)
+            except (pygame.error, FileNotFoundError) as e:
+                self._report_missing(path, e)
+                return None
+            with self._lock:
+                surface = self._raw_images.setdefault(path, surface)
+        return surface
+
+    # Display-format surface for path, optionally scaled to size; None if the
+    # file can't be loaded
+    def image(self, path, size=None):
+        path = self._key(path)
+        key = (path, size)
+        with self._lock:
+            surface = self._images.get(key)
+        if surface is not None:
+            return surface
+
+        surface = self._load_raw_image(path)
+        if surface is None:
+            return None
+        if size is not None:
+            surface = pygame.transform.scale(surface, size)
+        if pygame.display.get_surface() is None:
+            return surface  # Can't convert yet; try again once the display is up
+        surface = surface.convert_alpha() if surface.get_alpha() is not None else surface.convert()
+        with self._lock:
+            surface = self._images.setdefault(key, surface)
+            # The unscaled original isn't needed once every user has its own copy
+            if size is not None:
+                self._raw_images.pop(path, None)
+        return surface
+
+    def sound(self, path):
+        path = self._key(path)
+        with self._lock:
+            sound = self._sounds.get(path)
+        if sound is None and path not in self._missing:
+            if not mixer.get_init():
+                mixer.init()
+            try:
+                sound = mixer.Sound(path)
+            except (pygame.error, FileNotFoundError) as e:
+                self._report_missing(path, e)
+                return None
+            with self._lock:
+                sound = self._sounds.setdefault(path, sound)
+        return sound
+
+    # Load and decode paths on a background thread; images still get converted
+    # on first use since that needs the display
+    def prefetch(self, paths):
+        def load_all():
+            for path in paths:
+                if path.lower().endswith(SOUND_EXTENSIONS):
+                    self.sound(path)
+                elif path.lower().endswith(IMAGE_EXTENSIONS):
+                    self._load_raw_image(self._key(path))
+        self._prefetch_thread = threading.Thread(target=load_all, daemon=True)
+        self._prefetch_thread.start()
+        return self._prefetch_thread
+
+    def wait(self, timeout=None):
+        if self._prefetch_thread is not None:
+            self._prefetch_thread.join(timeout)
+
+    # Memory held by the cache, in bytes
+    def stats(self):
+        with self._lock:
+            image_bytes = sum(s.get_bytesize() * s.get_width() * s.get_height()
+                              for s in list(self._images.values()) + list(self._raw_images.values()))
+            sounds = list(self._sounds.values())
+        sound_bytes = 0
+        if sounds and mixer.get_init():
+            frequency, size, channels = mixer.get_init()
+            bytes_per_second = frequency * abs(size) // 8 * channels
+            sound_bytes = int(sum(s.get_length() for s in sounds) * bytes_per_second)
+        return {'images': len(self._images), 'raw_images': len(self._raw_images), 'image_bytes': image_bytes,
+                'sounds': len(sounds), 'sound_bytes': sound_bytes, 'missing': sorted(self._missing)}
+
+_manager = AssetManager()
+
+def image(path, size=None):
+    return _manager.image(path, size)
+
+def sound(path):
+    return _manager.sound(path)
+
+def prefetch(paths):
+    return _manager.prefetch(paths)
+
+def stats():
+    return _manager.stats()
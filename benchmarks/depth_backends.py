@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import depth_model
+import settings
+from frame_sources import open_image_source
+
+# Compares depth inference backends on real frames: latency per scan and how
+# far each variant's depth map drifts from the reference (eager PyTorch at
+# full resolution, i.e. what app_2 did originally).
+#
+#   python benchmarks/depth_backends.py --source recordings/raw_x.avi \
+#       torch torch@512x384 torchscript@512x384 onnx@512x384 onnx@512x384+int8
+#
+# A variant is backend[@WIDTHxHEIGHT][+int8]. The first run of an exported
+# backend includes the export and is reported separately as warm-up.
+
+SCREEN_SIZE = (1024, 768)
+
+def parse_variant(text):
+    quantize = text.endswith('+int8')
+    if quantize:
+        text = text[:-len('+int8')]
+    backend, _, size = text.partition('@')
+    return backend, depth_model.parse_size(size), quantize
+
+# Warped RGB frames from the source, as app_2 feeds them to the model
+def load_images(spec, count, M):
+    source = open_image_source(spec, realtime=False)
+    images = []
+    try:
+        while len(images) < count:
+            ret, frame = source.read()
+            if not ret:
+                if source.eof:
+                    break
+                continue
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            images.append(Image.fromarray(cv2.warpPerspective(frame_rgb, M, SCREEN_SIZE)))
+    finally:
+        source.release()
+    return images
+
+def run_variant(variant, images, threads, repeats):
+    backend, input_size, quantize = parse_variant(variant)
+    service = depth_model.DepthModelService(backend=backend, input_size=input_size, threads=threads,
+                                            quantize=quantize)
+    service.start()
+    if not service.wait():
+        raise RuntimeError(f"{variant}: {service.error}")
+
+    start = time.perf_counter()
+    service.estimate(images[0])
+    warmup = time.perf_counter() - start
+
+    times = []
+    depths = []
+    for image in images:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            depth = service.estimate(image)
+            times.append(time.perf_counter() - start)
+        depths.append(depth)
+    return warmup, np.array(times), depths
+
+# Error of depth against the reference, both raw and after the min-max
+# normalization app_2 applies before colormapping
+def fidelity(depths, references):
+    abs_rel, rmse, corr = [], [], []
+    for depth, reference in zip(depths, references):
+        abs_rel.append(np.mean(np.abs(depth - reference) / np.maximum(np.abs(reference), 1e-6)))
+        normalized = (depth - depth.min()) / max(np.ptp(depth), 1e-6)
+        normalized_reference = (reference - reference.min()) / max(np.ptp(reference), 1e-6)
+        rmse.append(np.sqrt(np.mean((normalized - normalized_reference) ** 2)))
+        corr.append(np.corrcoef(depth.ravel(), reference.ravel())[0, 1])
+    return {'abs_rel': float(np.mean(abs_rel)), 'rmse_normalized': float(np.mean(rmse)),
+            'correlation': float(np.mean(corr))}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare depth inference backends against eager PyTorch')
+    parser.add_argument('variants', nargs='*', default=['torch', 'torchscript', 'onnx'])
+    parser.add_argument('--source', default=settings.CAMERA_SOURCE,
+                        help='frame source spec (camera index, video file, image directory)')
+    parser.add_argument('--frames', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=settings.DEPTH_THREADS)
+    parser.add_argument('--matrix', default='M.npy')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    images = load_images(args.source, args.frames, np.load(args.matrix))
+    if not images:
+        print(f"No frames could be read from {args.source}")
+        return 1
+    print(f"{len(images)} frames from {args.source}, {args.repeats} runs each, threads={args.threads or 'default'}")
+
+    _, reference_times, references = run_variant('torch', images, args.threads, args.repeats)
+    results = {}
+    for variant in args.variants:
+        try:
+            warmup, times, depths = run_variant(variant, images, args.threads, args.repeats)
+        except Exception as e:
+            print(f"{variant:<28} failed: {e}")
+            results[variant] = {'error': str(e)}
+            continue
+        result = {'warmup_s': warmup, 'p50_ms': float(np.percentile(times, 50) * 1000),
+                  'mean_ms': float(times.mean() * 1000),
+                  'speedup': float(np.median(reference_times) / np.median(times))}
+        result.update(fidelity(depths, references))
+        results[variant] = result
+        print(f"{variant:<28} p50 {result['p50_ms']:8.1f} ms  x{result['speedup']:4.2f}  "
+              f"abs_rel {result['abs_rel']:.4f}  rmse {result['rmse_normalized']:.4f}  "
+              f"corr {result['correlation']:.4f}  (warm-up {warmup:.1f}s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
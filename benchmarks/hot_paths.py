@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Headless: no window, no audio device, no frame pacing. Everything else
+# (landmark filter, tracking, text cache sizes, ...) follows the HOLO_*
+# environment, so tuning changes can be benchmarked as they are.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.update({
+    'HOLO_SOUND': '0',
+    'HOLO_TARGET_FPS': '100000',
+    'HOLO_IDLE_FPS': '100000',
+    'HOLO_VSYNC': '0',
+    'HOLO_PERF': '1',
+    'HOLO_PERF_HUD': '0',
+    'HOLO_PERF_DUMP': '',
+    'HOLO_PERF_WINDOW': '1000000',
+    'HOLO_APP_WARMUP': '0',
+})
+
+import cv2
+import numpy as np
+import pygame
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import perf_stats
+import app_registry
+from camera_manager import CameraManager
+from frame_sources import LandmarkReplaySource, open_frame_source
+
+# Benchmarks for the per-frame hot paths, without camera or display:
+#
+#   landmarks  CameraManager.get_transformed_landmarks for 0, 1 and 2 hands
+#   camera     CameraManager.update on file-backed frames (MediaPipe included)
+#   loops      one frame of run_home_screen and of every apps/app_*.run loop,
+#              driven by synthetic fingertip input replayed through CameraManager
+#   depth      app_2's perform_depth_estimation at several image sizes
+#
+#   python benchmarks/hot_paths.py                    # everything, compared to baseline.json
+#   python benchmarks/hot_paths.py loops --check      # exit 1 on a regression
+#   python benchmarks/hot_paths.py --save-baseline    # make this run the new baseline
+#
+# Each case reports throughput and p50/p99 latency. A case whose p50 is more
+# than --tolerance slower than in the baseline is flagged as a regression.
+# Baselines are only comparable on the same machine.
+
+SCREEN_SIZE = (1024, 768)
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+SUITES = ('landmarks', 'camera', 'loops', 'depth')
+DEPTH_SIZES = ((320, 240), (640, 480), (1024, 768))
+
+# Screen region the synthetic fingertip wanders through in each loop. The
+# regions keep clear of buttons that would leave the loop (Home, Exit), of
+# the home circle, and of the calculator's operator keys.
+LOOPS = {
+    'home_screen': ((40, 560, 300, 740), False),
+    'app_1': ((250, 200, 780, 560), True),  # Pinches now and then to draw lines
+    'app_2': ((150, 100, 880, 560), False),
+    'app_3': ((200, 150, 824, 560), False),
+    'app_4': ((330, 300, 610, 570), False),  # Digit keys only
+    'app_5': ((80, 430, 940, 680), False),
+}
+
+class EndOfInput(Exception):
+    pass
+
+# CameraManager that ends the loop it drives once the replay runs out
+class ReplayCameraManager(CameraManager):
+    def update(self):
+        if super().update():
+            return True
+        if self.source.eof:
+            raise EndOfInput()
+        return False
+
+def summarize(seconds, stages=None):
+    times = np.asarray(seconds, dtype=np.float64) * 1000.0
+    result = {
+        'count': int(len(times)),
+        'throughput': float(1000.0 / times.mean()) if len(times) and times.mean() > 0 else 0.0,
+        'p50_ms': float(np.percentile(times, 50)),
+        'p99_ms': float(np.percentile(times, 99)),
+        'mean_ms': float(times.mean()),
+    }
+    if stages:
+        result['stages'] = stages
+    return result
+
+# {stage: p50 ms} for the named perf_stats sources
+def stage_breakdown(*names):
+    stages = {}
+    for name in names:
+        for stage, values in perf_stats.get_stats(name).summary().items():
+            stages[f'{name}.{stage}'] = round(float(values['p50']), 4)
+    return stages
+
+# Synthetic replay input: hands whose index fingertips follow a Lissajous
+# curve through region (in screen pixels), mapped back into the camera frame
+# with the inverse of M, so CameraManager's transform lands them on screen
+class SyntheticHands:
+    def __init__(self, M):
+        self.M_inv = np.linalg.inv(M)
+        corners = np.array([[[0, 0], [SCREEN_SIZE[0], 0], [SCREEN_SIZE[0], SCREEN_SIZE[1]], [0, SCREEN_SIZE[1]]]],
+                           dtype=np.float64)
+        camera_corners = cv2.perspectiveTransform(corners, self.M_inv)[0]
+        width, height = np.ceil(camera_corners.max(axis=0)).astype(int) + 1
+        self.frame_size = (max(int(width), 640), max(int(height), 480))
+
+    def _to_camera(self, points):
+        camera = cv2.perspectiveTransform(points.reshape(1, -1, 2).astype(np.float64), self.M_inv)[0]
+        return camera / self.frame_size
+
+    def records(self, frames, hands=1, region=(200, 150, 824, 600), pinch=False, fps=30):
+        x0, y0, x1, y1 = region
+        records = []
+        for i in range(frames):
+            u = i / max(frames, 1)
+            tip = np.array([(x0 + x1) / 2 + (x1 - x0) / 2 * np.sin(2 * np.pi * 3 * u),
+                            (y0 + y1) / 2 + (y1 - y0) / 2 * np.sin(2 * np.pi * 2 * u + np.pi / 4)])
+            pinching = pinch and (i // 15) % 3 == 1
+            screen = np.empty((hands, 21, 2))
+            for hand in range(hands):
+                screen[hand] = tip + (hand * 150, 0)
+                screen[hand, 4] = screen[hand, 8] + (20 if pinching else 90, 0)  # Thumb tip
+            landmarks = np.zeros((hands, 21, 3), dtype=np.float32)
+            if hands:
+                landmarks[..., :2] = self._to_camera(screen).reshape(hands, 21, 2)
+            records.append((i / fps, landmarks, None))
+        return records
+
+    def source(self, frames, **kwargs):
+        return LandmarkReplaySource(self.records(frames, **kwargs), frame_size=self.frame_size, realtime=False)
+
+def bench_landmarks(args, synthetic):
+    results = {}
+    for hands in (0, 1, 2):
+        perf_stats.reset()
+        source = synthetic.source(args.frames, hands=hands)
+        camera_manager = CameraManager(args.matrix, *SCREEN_SIZE, threaded=False, source=source)
+        times = []
+        while camera_manager.update():
+            start = time.perf_counter()
+            camera_manager.get_transformed_landmarks()
+            times.append(time.perf_counter() - start)
+        camera_manager.release()
+        results[f'landmarks/{hands}_hands'] = summarize(times[args.warmup:])
+    return results
+
+# Textured noise frames written to a temporary directory, for when no
+# recording is given
+def synthetic_frames(count, size=(640, 480)):
+    directory = tempfile.mkdtemp(prefix='holo_bench_')
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        noise = (rng.random((size[1], size[0], 3)) * 255).astype(np.uint8)
+        cv2.imwrite(os.path.join(directory, f'frame_{i:04d}.png'), cv2.GaussianBlur(noise, (9, 9), 3))
+    return directory
+
+def bench_camera(args, synthetic):
+    directory = None
+    spec = args.source
+    if not spec:
+        directory = spec = synthetic_frames(30)
+    try:
+        perf_stats.reset()
+        source = open_frame_source(spec, realtime=False, loop=True)
+        camera_manager = CameraManager(args.matrix, *SCREEN_SIZE, threaded=False, source=source)
+        times = []
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            if not camera_manager.update():
+                break
+            camera_manager.get_transformed_landmarks()
+            times.append(time.perf_counter() - start)
+        camera_manager.release()
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {'camera/update': summarize(times[args.warmup:], stage_breakdown('camera.update', 'camera.inference'))}
+
+def bench_loops(args, synthetic):
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    results = {}
+    for name, (region, pinch) in LOOPS.items():
+        if args.only and name not in args.only:
+            continue
+        if name == 'home_screen':
+            import home_screen
+            run = home_screen.run_home_screen
+        else:
+            run = app_registry.entry(int(name.split('_')[1]))
+        perf_stats.reset()
+        source = synthetic.source(args.frames, region=region, pinch=pinch)
+        camera_manager = ReplayCameraManager(args.matrix, *SCREEN_SIZE, threaded=False, source=source)
+
+        # One frame is the time between two update() calls of the loop
+        stamps = []
+        update = camera_manager.update
+        def timed_update():
+            stamps.append(time.perf_counter())
+            return update()
+        camera_manager.update = timed_update
+        try:
+            run(screen, camera_manager)
+            print(f"{name} returned before its input ran out")
+        except EndOfInput:
+            pass
+        camera_manager.release()
+        results[f'loop/{name}'] = summarize(np.diff(stamps)[args.warmup:], stage_breakdown(name))
+    return results
+
+def bench_depth(args, synthetic):
+    import depth_model
+    service = depth_model.get_service()
+    service.start()
+    if not service.wait():
+        print(f"Skipping depth: model unavailable ({service.error})")
+        return {}
+    from apps import app_2
+    results = {}
+    rng = np.random.default_rng(0)
+    for width, height in DEPTH_SIZES:
+        service.stats.samples.clear()
+        image = Image.fromarray((rng.random((height, width, 3)) * 255).astype(np.uint8))
+        app_2.perform_depth_estimation(image, report=False)  # Warm-up
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            app_2.perform_depth_estimation(image, report=False)
+            times.append(time.perf_counter() - start)
+        stages = {f'depth_model.{stage}': round(float(values['p50']), 4)
+                  for stage, values in service.stats.summary().items()}
+        results[f'depth/{width}x{height}'] = summarize(times, stages)
+    return results
+
+# Print one line per case and return the names of the cases that regressed
+def report(results, baseline, tolerance):
+    regressions = []
+    print(f"{'case':<24} {'count':>6} {'per s':>9} {'p50 ms':>9} {'p99 ms':>9}  vs baseline p50")
+    for name, result in results.items():
+        line = (f"{name:<24} {result['count']:>6} {result['throughput']:>9.1f} "
+                f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f}")
+        base = baseline.get(name)
+        if base and base.get('p50_ms'):
+            change = result['p50_ms'] / base['p50_ms'] - 1.0
+            line += f"  {change * 100:+6.1f}%"
+            if change > tolerance:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the tracking, rendering and depth hot paths headlessly')
+    parser.add_argument('suites', nargs='*', help=f"any of {', '.join(SUITES)} (default: all)")
+    parser.add_argument('--frames', type=int, default=300, help='frames per landmark/camera/loop case')
+    parser.add_argument('--warmup', type=int, default=20, help='leading frames left out of the statistics')
+    parser.add_argument('--repeats', type=int, default=5, help='runs per depth resolution')
+    parser.add_argument('--only', nargs='*', help='loops to run, e.g. home_screen app_4')
+    parser.add_argument('--source', default='',
+                        help='frame source for the camera suite (video, image directory); synthetic by default')
+    parser.add_argument('--matrix', default=os.path.join(ROOT, 'M.npy'))
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown, as a fraction')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 if any case regressed')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+    unknown = [suite for suite in args.suites if suite not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    os.chdir(ROOT)  # Apps load audio/ and resources/ relative to the repo
+    pygame.init()
+    synthetic = SyntheticHands(np.load(args.matrix))
+    benches = {'landmarks': bench_landmarks, 'camera': bench_camera, 'loops': bench_loops, 'depth': bench_depth}
+    results = {}
+    for suite in args.suites or SUITES:
+        started = time.perf_counter()
+        results.update(benches[suite](args, synthetic))
+        print(f"{suite} done in {time.perf_counter() - started:.1f}s")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('results', {})
+    regressions = report(results, baseline, args.tolerance)
+
+    document = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'processor': platform.processor(), 'cpus': os.cpu_count()},
+        'frames': args.frames,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"Wrote results to {args.output}")
+    if args.save_baseline:
+        if baseline:
+            # Keep cases this run skipped (e.g. depth without a model)
+            document['results'] = dict(baseline, **results)
+        with open(args.baseline, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        if args.check:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
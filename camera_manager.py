@@ -1,116 +1,613 @@
+import threading
+import time
 import cv2
 import numpy as np
 import mediapipe as mp
+import settings
+import perf_stats
+from recorder import VideoRecorder
+from landmark_filter import OneEuroFilter
+from hand_tracker import LandmarkTracker, TrackedHands
+from inference_worker import InferenceWorkers, RemoteHands
+from frame_sources import LandmarkFrame, open_frame_source
+from landmark_stream import LandmarkStreamWriter, HANDEDNESS_CODES, HAND_UNKNOWN
+
+# Single-slot queue that only ever holds the newest item. put() never blocks and
+# overwrites anything the consumer has not picked up yet, so a slow stage always
+# works on the most recent data instead of a growing backlog.
+class LatestValue:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.seq = 0
+        self.closed = False
+
+    def put(self, item):
+        with self._cond:
+            self._item = item
+            self.seq += 1
+            self._cond.notify_all()
+
+    # Return (seq, item) as soon as an item newer than last_seq is available,
+    # or whatever is currently held once the timeout expires
+    def get(self, last_seq=0, timeout=None):
+        with self._cond:
+            if self.seq <= last_seq and not self.closed:
+                self._cond.wait_for(lambda: self.seq > last_seq or self.closed, timeout)
+            return self.seq, self._item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+# Copy MediaPipe (or tracked) landmarks, normalized to the inference crop,
+# into out, a (hands, 21, 3) buffer, and return the number of hands
+def extract_landmarks(results, out):
+    if isinstance(results, TrackedHands):
+        count = min(len(results.landmarks), len(out))
+        out[:count] = results.landmarks[:count]
+        return count
+    hands = (results.multi_hand_landmarks or [])[:len(out)]
+    for i, hand_landmarks in enumerate(hands):
+        out[i].reshape(-1)[:] = np.fromiter(
+            (c for landmark in hand_landmarks.landmark for c in (landmark.x, landmark.y, landmark.z)),
+            dtype=np.float32, count=63)
+    return len(hands)
+
+# Fill out with the landmark_stream handedness code of each hand in results
+def extract_handedness(results, out):
+    out[:] = HAND_UNKNOWN
+    if isinstance(results, RemoteHands):
+        out[:] = results.handedness[:len(out)]
+        return
+    for i, classification in enumerate((results.multi_handedness or [])[:len(out)]):
+        out[i] = HANDEDNESS_CODES.get(classification.classification[0].label, HAND_UNKNOWN)
 
 class CameraManager:
-    def __init__(self, transformation_matrix_path, width, height):
+    def __init__(self, transformation_matrix_path, width, height, threaded=settings.CAMERA_THREADED,
+                 record=settings.RECORD_STREAM, roi=settings.CAMERA_ROI,
+                 roi_margin=settings.CAMERA_ROI_MARGIN, roi_scale=settings.CAMERA_ROI_SCALE,
+                 preview=settings.CAMERA_PREVIEW, source=None, landmark_log=settings.LANDMARK_LOG,
+                 smoothing=settings.LANDMARK_FILTER, detect_interval=settings.TRACK_DETECT_INTERVAL,
+                 workers=settings.INFERENCE_WORKERS):
         self.width = width
         self.height = height
-        self.cap = cv2.VideoCapture(1)
-        
-        # Get the frame rate from the camera
-        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
-        if not self.fps > 0:
-            self.fps = 30  # Default to 30 FPS if the frame rate cannot be obtained
+
+        # Where frames come from: the live camera by default, or a video file,
+        # image sequence or landmark replay (see frame_sources)
+        if source is None:
+            source = open_frame_source(settings.CAMERA_SOURCE,
+                                       realtime=settings.CAMERA_REALTIME,
+                                       loop=settings.CAMERA_LOOP)
+        self.source = source
+        self.fps = source.fps
+
+        # An unpaced replay produces frames faster than inference can take
+        # them, and the pipeline's newest-frame slots would drop most of them.
+        # Process every frame in turn instead.
+        if threaded and not source.realtime:
+            print("Frame source is not paced, running the camera pipeline synchronously")
+            threaded = False
 
         self.M = np.load(transformation_matrix_path)
-        
-        # Initialize mediapipe
+
+        # Initialize mediapipe. With inference workers, MediaPipe runs in
+        # their processes instead (see inference_worker), which only works
+        # with the pipelined threads.
+        self.max_num_hands = 2
         self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(static_image_mode=False,
-                                         max_num_hands=2,
-                                         min_detection_confidence=0.1,
-                                         min_tracking_confidence=0.1)
+        self.workers = None
+        if workers > 0 and threaded:
+            self.workers = InferenceWorkers(workers, self.max_num_hands, roi_scale)
+            self.hands = None
+        else:
+            self.hands = self._create_hands()
         self.mp_drawing = mp.solutions.drawing_utils
 
+        # Region of the camera frame handed to MediaPipe as (x0, y0, x1, y1).
+        # In ROI mode it is the padded bounding box of the projected surface,
+        # worked out from M once the first frame's size is known.
+        self.use_roi = roi
+        self.roi_margin = roi_margin
+        self.roi_scale = roi_scale
+        self.roi = None
+
+        # Detect-then-track: with an interval above 1, MediaPipe only runs on
+        # every Nth frame (or when tracking is lost) and optical flow carries
+        # the landmarks in between (see hand_tracker)
+        self.tracker = LandmarkTracker(detect_interval) if detect_interval > 1 else None
+
         self.frame = None
         self.results = None
+        self.frame_seq = 0
+        self.finished = False  # The source ran out and its last frame has been handed out
+        self.capture_time = None  # time.monotonic() at which self.frame was captured
+
+        # Per-stage timings (see perf_stats): one lap timer per pipeline stage,
+        # plus camera.update for one-off measurements such as the warp and the
+        # capture-to-consumer latency
+        self.stats = perf_stats.get_stats('camera.update')
+        self._capture_timer = perf_stats.frame_timer('camera.capture')
+        self._process_timer = perf_stats.frame_timer('camera.inference')
+        self._update_timer = perf_stats.FrameTimer(self.stats)
+
+        # Debug views are only built when something asks for them (see the
+        # warped_frame and annotated_frame properties), at most once per frame
+        self.preview = preview
+        self.last_key = None
+        self._warped_frame = None
+        self._warped_seq = -1
+        self._annotated_frame = None
+        self._annotated_seq = -1
+
+        # Preallocated landmark buffers for the batched transform (hands x 21 x 3
+        # normalized landmarks in, hands x 21 x 2 screen points out), plus the
+        # per-frame cache of the transformed result
+        self._hand_points = np.zeros((self.max_num_hands, 21, 3), dtype=np.float32)
+        self._screen_points = np.zeros((self.max_num_hands, 21, 2), dtype=np.float32)
+        self._screen_max = np.array([width - 1, height - 1], dtype=np.float32)
+        self._landmark_M = None
+        self._landmark_roi = None
+        self._landmarks = None
+        self._landmarks_seq = -1
+
+        # Jitter filter (and optional latency prediction) on the screen points
+        self.landmark_filter = OneEuroFilter() if smoothing else None
+
+        # Optional session recording ('raw', 'warped' or 'annotated'); frames are
+        # encoded on the recorder's own thread, off the interactive path
+        self.recorder = None
+        if record:
+            self.recorder = VideoRecorder(stream=record,
+                                          directory=settings.RECORD_DIR,
+                                          fps=self.fps,
+                                          buffer_size=settings.RECORD_BUFFER_FRAMES,
+                                          max_segment_bytes=settings.RECORD_SEGMENT_MB * 1024 * 1024,
+                                          max_segment_seconds=settings.RECORD_SEGMENT_SECONDS)
+
+        # Optional compact landmark log for replay (see landmark_stream). It is
+        # written from the inference stage, opened once the frame size is known.
+        self.landmark_log = landmark_log
+        self.landmark_writer = None
+        self._log_points = np.zeros((self.max_num_hands, 21, 3), dtype=np.float32)
+        self._track_points = np.zeros((self.max_num_hands, 21, 3), dtype=np.float32)
+        self._log_handedness = np.zeros(self.max_num_hands, dtype=np.uint8)
+
+        # Pipelined mode: capture and inference run on their own threads, linked
+        # by latest-value slots, and update() just picks up the newest result
+        self.threaded = threaded
+        self._frames = LatestValue()
+        self._results = LatestValue()
+        self._result_seq = 0
+        self._running = threaded
+        self._dispatch_done = False
+        self._idle_interval = None
+        self._threads = []
+        if threaded:
+            if self.workers is not None:
+                stages = ((self._capture_loop, 'camera-capture'),
+                          (self._dispatch_loop, 'camera-dispatch'),
+                          (self._collect_loop, 'camera-collect'))
+            else:
+                stages = ((self._capture_loop, 'camera-capture'),
+                          (self._inference_loop, 'camera-inference'))
+            for target, name in stages:
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _capture_loop(self):
+        while self._running:
+            self._capture_timer.start()
+            ret, frame = self.source.read()
+            self._capture_timer.lap('read')
+            if not ret:
+                if self.source.eof:
+                    print("Frame source finished")
+                    self._frames.close()  # Let the next stages drain and stop
+                    break
+                print("Failed to capture frame")
+                time.sleep(0.1)  # Back off before retrying
+                continue
+            self._frames.put((time.monotonic(), frame))
+            self._capture_timer.stop()
+
+    def _inference_loop(self):
+        last_seq = 0
+        while self._running:
+            seq, item = self._frames.get(last_seq, timeout=0.5)
+            if seq == last_seq or item is None:
+                if self._frames.closed:
+                    break  # The source ran out and its last frame is done
+                continue
+            last_seq = seq
+            capture_time, frame = item
+            started = time.monotonic()
+            self._results.put((capture_time, *self._process(frame, capture_time)))
+
+            # While the UI is idle, run inference at the idle rate only
+            idle_interval = self._idle_interval
+            if idle_interval:
+                remaining = started + idle_interval - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+        self._results.close()
+
+    # Worker mode: hand the newest frame to an idle inference worker. While
+    # all of them are busy, frames are skipped rather than queued.
+    def _dispatch_loop(self):
+        last_seq = 0
+        while self._running:
+            seq, item = self._frames.get(last_seq, timeout=0.5)
+            if seq == last_seq or item is None:
+                if self._frames.closed:
+                    self._dispatch_done = True  # The collector stops once the last results are in
+                    break
+                continue
+            capture_time, frame = item
+            if isinstance(frame, LandmarkFrame):
+                last_seq = seq
+                self._results.put((capture_time, frame.image, frame))
+                continue
+            if not self.workers.started:
+                self.roi = self._compute_roi(frame.shape[1], frame.shape[0])
+                self.workers.start(frame.shape)
+            if not self.workers.alive:
+                # Every worker died (e.g. MediaPipe failed to load in them);
+                # carry on with inference on this thread
+                print("No hand inference workers left, running inference in this process")
+                self.hands = self._create_hands()
+                self._inference_loop()
+                return
+            started = time.monotonic()
+            if not self.workers.submit(frame, capture_time, self.roi):
+                self.workers.wait_idle(timeout=0.5)
+                continue  # Pick up whatever frame is newest by now
+            last_seq = seq
+
+            idle_interval = self._idle_interval
+            if idle_interval:
+                remaining = started + idle_interval - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+
+    # Worker mode: publish finished results. Workers can finish out of
+    # order; a result older than one already published is dropped.
+    def _collect_loop(self):
+        newest = 0
+        stats = self._process_timer.stats
+        while self._running:
+            for seq, capture_time, frame, results in self.workers.collect(timeout=0.5):
+                now = time.monotonic()
+                stats.add_frame(now, {'inference': results.inference_time, 'turnaround': now - capture_time})
+                if seq < newest:
+                    continue
+                newest = seq
+                if self.landmark_log:
+                    self._log_landmarks(frame, results)
+                if self.recorder:
+                    self._record(frame, results, capture_time)
+                self._results.put((capture_time, frame, results))
+            if self._dispatch_done and not self.workers.busy:
+                break
+        self._results.close()
+
+    def _create_hands(self):
+        return self.mp_hands.Hands(static_image_mode=False,
+                                   max_num_hands=self.max_num_hands,
+                                   min_detection_confidence=0.1,
+                                   min_tracking_confidence=0.1)
+
+    # Throttle pipelined inference to settings.IDLE_FPS while nothing is going on
+    # (called by FrameScheduler); in synchronous mode the slower UI loop already
+    # reads fewer frames
+    def set_idle(self, idle):
+        self._idle_interval = 1.0 / settings.IDLE_FPS if idle else None
 
-        # Initialize VideoWriter for original and warped feeds
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        self.out_original = cv2.VideoWriter('original_feed.avi', fourcc, self.fps, (int(self.cap.get(3)), int(self.cap.get(4))))
-        # self.out_warped = cv2.VideoWriter('warped_feed.avi', fourcc, self.fps, (width, height))
+    # Bounding box of the screen area back-projected into the camera frame
+    def _compute_roi(self, frame_width, frame_height):
+        full_frame = (0, 0, frame_width, frame_height)
+        if not self.use_roi:
+            return full_frame
+
+        corners = np.array([[[0, 0], [self.width, 0], [self.width, self.height], [0, self.height]]],
+                           dtype=np.float32)
+        camera_corners = cv2.perspectiveTransform(corners, np.linalg.inv(self.M))[0]
+        x0, y0 = camera_corners.min(axis=0)
+        x1, y1 = camera_corners.max(axis=0)
+
+        # Pad the box so hands reaching in from the edge are still detected
+        pad_x = (x1 - x0) * self.roi_margin
+        pad_y = (y1 - y0) * self.roi_margin
+        x0 = max(int(x0 - pad_x), 0)
+        y0 = max(int(y0 - pad_y), 0)
+        x1 = min(int(np.ceil(x1 + pad_x)), frame_width)
+        y1 = min(int(np.ceil(y1 + pad_y)), frame_height)
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            print("Projection area is outside the camera frame, running inference on the full frame")
+            return full_frame
+
+        print(f"Hand inference ROI: {(x0, y0, x1, y1)} of {frame_width}x{frame_height}")
+        return x0, y0, x1, y1
+
+    # Run hand inference on a BGR frame captured at capture_time (time.monotonic())
+    def _process(self, frame, capture_time=None):
+        # Recorded landmarks bypass inference entirely
+        if isinstance(frame, LandmarkFrame):
+            return frame.image, frame
+
+        timer = self._process_timer
+        timer.start()
+        if self.roi is None:
+            self.roi = self._compute_roi(frame.shape[1], frame.shape[0])
+        x0, y0, x1, y1 = self.roi
+
+        # Crop to the projection area and optionally downscale before inference.
+        # MediaPipe reports landmarks normalized to the crop, which the landmark
+        # transform maps back to full-frame pixels.
+        roi_frame = frame[y0:y1, x0:x1]
+        if self.roi_scale != 1.0:
+            roi_frame = cv2.resize(roi_frame, None, fx=self.roi_scale, fy=self.roi_scale,
+                                   interpolation=cv2.INTER_AREA)
+
+        results = None
+        tracker = self.tracker
+        if tracker is not None:
+            gray = cv2.cvtColor(roi_frame, cv2.COLOR_BGR2GRAY)
+            if not tracker.needs_detection():
+                results = tracker.track(gray)
+                timer.lap('track')
+
+        # Full inference when tracking is off, due or lost
+        if results is None:
+            # Convert to RGB
+            rgb_frame = cv2.cvtColor(roi_frame, cv2.COLOR_BGR2RGB)
+            timer.lap('convert')
+
+            # Run inference for hand detection
+            results = self.hands.process(rgb_frame)
+            timer.lap('inference')
+
+            if tracker is not None:
+                count = extract_landmarks(results, self._track_points)
+                tracker.detected(gray, self._track_points[:count], results.multi_handedness)
+
+        if self.landmark_log:
+            self._log_landmarks(frame, results)
+            timer.lap('log')
+
+        if self.recorder:
+            self._record(frame, results, capture_time)
+            timer.lap('record')
+
+        timer.stop()
+        return frame, results
+
+    # Hand the frame to the recorder with its capture time, which keeps the
+    # recording in real time however often inference gets to run
+    def _record(self, frame, results, capture_time=None):
+        if self.recorder.stream == 'annotated':
+            self.recorder.write(self._annotate(frame, results), capture_time)
+        elif self.recorder.stream == 'warped':
+            self.recorder.write(self._warp(frame), capture_time)
+        else:
+            self.recorder.write(frame, capture_time)
+
+    # Append this frame's landmarks, normalized to the full frame, to the landmark log
+    def _log_landmarks(self, frame, results):
+        height, width = frame.shape[:2]
+        if self.landmark_writer is None:
+            # Runs on the inference thread, so an unusable log must not raise
+            try:
+                self.landmark_writer = LandmarkStreamWriter(self.landmark_log, (width, height),
+                                                            max_hands=self.max_num_hands)
+            except (ValueError, OSError) as e:
+                print(f"Landmark logging disabled: {e}")
+                self.landmark_log = None
+                return
+        count = extract_landmarks(results, self._log_points)
+        points = self._log_points[:count]
+        x0, y0, x1, y1 = self.roi
+        points[..., 0] = (points[..., 0] * (x1 - x0) + x0) / width
+        points[..., 1] = (points[..., 1] * (y1 - y0) + y0) / height
+        handedness = self._log_handedness[:count]
+        extract_handedness(results, handedness)
+        self.landmark_writer.write(time.time(), points, handedness)
+
+    # Draw hand landmarks on a copy of the frame so the raw frame stays
+    # untouched. Drawing into the ROI view puts the crop-relative landmarks
+    # in the right place.
+    def _annotate(self, frame, results):
+        if isinstance(results, TrackedHands):
+            # Tracked frames show their landmarks as plain dots
+            x0, y0, x1, y1 = self.roi
+            annotated = frame.copy()
+            for point in (results.landmarks[..., :2] * (x1 - x0, y1 - y0) + (x0, y0)).reshape(-1, 2):
+                cv2.circle(annotated, (int(point[0]), int(point[1])), 3, (0, 255, 255), -1)
+            return annotated
+        if not results.multi_hand_landmarks:
+            return frame
+        x0, y0, x1, y1 = self.roi
+        annotated = frame.copy()
+        for hand_landmarks in results.multi_hand_landmarks:
+            self.mp_drawing.draw_landmarks(
+                annotated[y0:y1, x0:x1], hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
+        return annotated
+
+    def _warp(self, frame):
+        return cv2.warpPerspective(frame, self.M, (self.width, self.height))
+
+    # Camera frame warped onto the projected surface, built on first access per frame
+    @property
+    def warped_frame(self):
+        if self.frame is None:
+            return None
+        if self._warped_seq != self.frame_seq:
+            start = time.perf_counter()
+            self._warped_frame = self._warp(self.frame)
+            self._warped_seq = self.frame_seq
+            self.stats.add('warp', time.perf_counter() - start)
+        return self._warped_frame
+
+    # Camera frame with the hand skeletons drawn on, built on first access per frame
+    @property
+    def annotated_frame(self):
+        if self.frame is None:
+            return None
+        if self._annotated_seq != self.frame_seq:
+            self._annotated_frame = self._annotate(self.frame, self.results)
+            self._annotated_seq = self.frame_seq
+        return self._annotated_frame
 
     def update(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            print("Failed to capture frame")
-            return False
-
-        # Convert to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Run inference for hand detection
-        self.results = self.hands.process(rgb_frame)
-
-        # Draw hand landmarks on the frame
-        if self.results.multi_hand_landmarks:
-            for hand_landmarks in self.results.multi_hand_landmarks:
-                self.mp_drawing.draw_landmarks(
-                    frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
-
-        # Save the original frame
-        self.frame = frame
-
-        # Warp the frame
-        warped_frame = cv2.warpPerspective(frame, self.M, (self.width, self.height))
-        
-        # Draw hand landmarks on the warped frame
-        if self.results.multi_hand_landmarks:
-            for hand_landmarks in self.results.multi_hand_landmarks:
-                self.mp_drawing.draw_landmarks(
-                    warped_frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
-
-        # Show the frames
-        cv2.imshow("Camera View", frame)
-        # cv2.imshow("Warped View", warped_frame)
-
-        # Write the frames to the video files
-        self.out_original.write(frame)
-        # self.out_warped.write(warped_frame)
+        self.last_key = None
+        timer = self._update_timer
+        timer.start()
+        if self.threaded:
+            # Never wait for the camera once a result exists; only the very
+            # first call blocks briefly until the pipeline has produced one
+            timeout = 0 if self._result_seq else 1.0
+            seq, result = self._results.get(self._result_seq, timeout=timeout)
+            if seq == self._result_seq:
+                # Nothing new; once the source has run out nothing ever will be
+                if self._results.closed:
+                    self.finished = True
+                    return False
+                return result is not None
+            self._result_seq = seq
+            self.capture_time, self.frame, self.results = result
+            timer.lap('fetch')
+        else:
+            capture_time = time.monotonic()
+            ret, frame = self.source.read()
+            if not ret:
+                if self.source.eof:
+                    self.finished = True
+                else:
+                    print("Failed to capture frame")
+                return False
+            timer.lap('read')
+            self.frame, self.results = self._process(frame, capture_time)
+            self.capture_time = capture_time
+            timer.lap('process')
+        self.frame_seq += 1
+
+        # Show the preview window (and pump its events) only when enabled
+        if self.preview:
+            cv2.imshow("Camera View", self.annotated_frame)
+            self.last_key = cv2.waitKey(1) & 0xFF
+            timer.lap('preview')
 
+        # Age of the frame by the time the consumer gets hold of it
+        timer.laps['latency'] = time.monotonic() - self.capture_time
+        timer.stop()
         return True
 
+    # Grab a fresh raw camera frame for one-off consumers such as depth scans.
+    # In pipelined mode the capture thread owns the device, so wait for its
+    # next frame instead of reading the camera concurrently.
+    def read_frame(self):
+        if self.threaded:
+            _, item = self._frames.get(self._frames.seq, timeout=1.0)
+            frame = item[1] if item is not None else None
+            ret = frame is not None
+        else:
+            ret, frame = self.source.read()
+        if isinstance(frame, LandmarkFrame):
+            frame = frame.image
+        return ret, frame
+
+    # Transform every detected hand onto the screen in one batch. The result is
+    # cached per camera frame, so repeated calls in the same loop iteration are
+    # free. The returned arrays are views into a reused buffer and are
+    # overwritten by the next frame; copy them to keep them around.
     def get_transformed_landmarks(self):
-        if self.results and self.results.multi_hand_landmarks:
-            transformed_landmarks = []
-            for hand_landmarks in self.results.multi_hand_landmarks:
-                # Extract landmark coordinates
-                landmark_coords = []
-                for landmark in hand_landmarks.landmark:
-                    x = int(landmark.x * self.frame.shape[1])
-                    y = int(landmark.y * self.frame.shape[0])
-                    landmark_coords.append([x, y])
-                
-                landmark_coords = np.array(landmark_coords, dtype=np.float32)
-
-                # Apply M transformation to landmark coordinates
-                transformed_coords = cv2.perspectiveTransform(np.array([landmark_coords]), self.M)[0]
-                
-                # Clip coordinates to be within the screen bounds
-                transformed_coords = np.clip(transformed_coords, [0, 0], [self.width - 1, self.height - 1])
-                transformed_landmarks.append(transformed_coords)
-
-            return transformed_landmarks
-        
-        return None
+        if self._landmarks_seq != self.frame_seq:
+            start = time.perf_counter()
+            self._landmarks = self._transform_landmarks()
+            self._landmarks_seq = self.frame_seq
+            self.stats.add('landmarks', time.perf_counter() - start)
+        return self._landmarks
+
+    def _transform_landmarks(self):
+        if isinstance(self.results, LandmarkFrame):
+            # Replayed landmarks are already an array normalized to the full frame
+            count = min(len(self.results.landmarks), self.max_num_hands)
+            if count == 0:
+                return None
+            points = self._hand_points[:count, :, :2]
+            points[:] = self.results.landmarks[:count, :, :2]
+            roi = (0, 0, self.frame.shape[1], self.frame.shape[0])
+        elif isinstance(self.results, TrackedHands) or (self.results and self.results.multi_hand_landmarks):
+            # Pull all hands' normalized landmark coordinates into the shared buffer
+            count = extract_landmarks(self.results, self._hand_points)
+            if count == 0:
+                return None  # A worker result without hands
+            points = self._hand_points[:count, :, :2]
+            roi = self.roi
+        else:
+            return None
+
+        # Fold the ROI-normalized -> full-frame pixel mapping into M once
+        if roi != self._landmark_roi:
+            x0, y0, x1, y1 = roi
+            to_pixels = np.array([[x1 - x0, 0, x0],
+                                  [0, y1 - y0, y0],
+                                  [0, 0, 1]], dtype=np.float64)
+            self._landmark_M = (self.M @ to_pixels).astype(np.float32)
+            self._landmark_roi = roi
+
+        # Apply M to every landmark with a single matrix multiply
+        M = self._landmark_M
+        projected = points @ M[:, :2].T + M[:, 2]
+        transformed = self._screen_points[:count]
+        np.divide(projected[..., :2], projected[..., 2:], out=transformed)
+
+        # Smooth before clipping so the filter sees the true motion near the
+        # edges. Replayed landmarks carry their recorded timestamps, which stay
+        # right when the replay runs faster than real time.
+        if self.landmark_filter is not None:
+            timestamp = self.capture_time
+            if isinstance(self.results, LandmarkFrame) and self.results.timestamp is not None:
+                timestamp = self.results.timestamp
+            self.landmark_filter.filter(transformed, timestamp)
+
+        # Clip coordinates to be within the screen bounds
+        np.clip(transformed, 0, self._screen_max, out=transformed)
+        return list(transformed)
 
     def release(self):
-        self.cap.release()
-        self.out_original.release()
-        # self.out_warped.release()
-        cv2.destroyAllWindows()
+        self._running = False
+        self._frames.close()
+        self._results.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        if self.workers is not None:
+            self.workers.close()
+        self.source.release()
+        if self.tracker:
+            stats = self.tracker.stats()
+            print(f"Hand tracking: {stats['tracked_fraction'] * 100:.0f}% of frames tracked, "
+                  f"{stats['fallbacks']} fallbacks to detection, "
+                  f"mean forward-backward error {stats['error']:.2f} px")
+        if self.recorder:
+            self.recorder.close()
+        if self.landmark_writer:
+            self.landmark_writer.close()
+        if self.preview:
+            cv2.destroyAllWindows()
 
 # Example usage
 if __name__ == "__main__":
     transformation_matrix_path = 'M.npy'
     width, height = 1070, 700
-    camera_manager = CameraManager(transformation_matrix_path, width, height)
+    camera_manager = CameraManager(transformation_matrix_path, width, height, preview=True)
 
     while True:
         if not camera_manager.update():
             break
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        if camera_manager.last_key == ord('q'):
             break
 
     camera_manager.release()
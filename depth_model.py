@@ -0,0 +1,282 @@
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from PIL import Image
+import perf_stats
+import settings
+
+# Keeps the depth-estimation model for app_2 loaded in the background.
+#
+# start() loads the image processor and model on a worker thread, from the
+# local cache only unless HOLO_DEPTH_OFFLINE=0, so importing app_2 or opening
+# it never blocks on torch or the weights. The service lives for the whole
+# process, so the model stays resident between launches of the app. state
+# tells the app whether it can scan yet; load and inference times are
+# recorded in the 'depth_model' perf stats.
+#
+# Inference goes through a backend: eager PyTorch (the reference), a traced
+# TorchScript module or an ONNX Runtime session. The exported backends are
+# built once per input shape and cached on disk, so later runs skip the
+# export (and, for ONNX, loading the PyTorch model at all).
+
+IDLE = 'idle'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+BACKENDS = ('torch', 'torchscript', 'onnx')
+
+# '512x384' -> (512, 384); '' -> None
+def parse_size(text):
+    if not text:
+        return None
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+# Wraps the Hugging Face model so tracing/exporting sees a plain tensor -> tensor module
+def depth_only_module(torch, model):
+    class DepthOnly(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model(pixel_values).predicted_depth
+
+    return DepthOnly().eval()
+
+def quantize_model(torch, model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+# Each backend takes the processor's pixel values, a (1, 3, H, W) float32
+# array, and returns the model's depth prediction as an (h, w) float array.
+class TorchBackend:
+    name = 'torch'
+
+    def __init__(self, torch, load_model, quantize=False):
+        self.torch = torch
+        self.model = load_model()
+        if quantize:
+            self.model = quantize_model(torch, self.model)
+
+    def predict(self, pixel_values):
+        with self.torch.no_grad():
+            outputs = self.model(self.torch.from_numpy(pixel_values))
+        return outputs.predicted_depth[0].numpy()
+
+class TorchScriptBackend:
+    name = 'torchscript'
+
+    def __init__(self, torch, load_model, export_path, quantize=False):
+        self.torch = torch
+        self.load_model = load_model
+        self.export_path = export_path + ('_int8' if quantize else '')
+        self.quantize = quantize
+        self._model = None
+        self._modules = {}  # input shape -> traced module
+
+    def _module(self, shape):
+        module = self._modules.get(shape)
+        if module is not None:
+            return module
+        path = f'{self.export_path}_{shape[3]}x{shape[2]}.pt'
+        if os.path.exists(path):
+            module = self.torch.jit.load(path)
+        else:
+            if self._model is None:
+                self._model = self.load_model()
+                if self.quantize:
+                    self._model = quantize_model(self.torch, self._model)
+            print(f"Tracing depth model to {path}")
+            with self.torch.no_grad():
+                module = self.torch.jit.trace(depth_only_module(self.torch, self._model),
+                                              self.torch.zeros(shape), check_trace=False)
+            module.save(path)
+        self._modules[shape] = module
+        return module
+
+    def predict(self, pixel_values):
+        module = self._module(pixel_values.shape)
+        with self.torch.no_grad():
+            return module(self.torch.from_numpy(pixel_values))[0].numpy()
+
+class OnnxBackend:
+    name = 'onnx'
+
+    def __init__(self, load_torch, load_model, export_path, threads=0, quantize=False):
+        import onnxruntime
+        self.onnxruntime = onnxruntime
+        self.load_torch = load_torch
+        self.load_model = load_model
+        self.export_path = export_path
+        self.threads = threads
+        self.quantize = quantize
+        self._sessions = {}  # input shape -> InferenceSession
+
+    def _export(self, shape, path):
+        torch = self.load_torch()
+        print(f"Exporting depth model to {path}")
+        with torch.no_grad():
+            torch.onnx.export(depth_only_module(torch, self.load_model()), torch.zeros(shape), path,
+                              input_names=['pixel_values'], output_names=['predicted_depth'],
+                              opset_version=17)
+
+    def _session(self, shape):
+        session = self._sessions.get(shape)
+        if session is not None:
+            return session
+        path = f'{self.export_path}_{shape[3]}x{shape[2]}.onnx'
+        if not os.path.exists(path):
+            self._export(shape, path)
+        if self.quantize:
+            quantized_path = path[:-len('.onnx')] + '_int8.onnx'
+            if not os.path.exists(quantized_path):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+            path = quantized_path
+        options = self.onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        session = self.onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self._sessions[shape] = session
+        return session
+
+    def predict(self, pixel_values):
+        return self._session(pixel_values.shape).run(None, {'pixel_values': pixel_values})[0][0]
+
+class DepthModelService:
+    def __init__(self, checkpoint=settings.DEPTH_CHECKPOINT, cache_dir=settings.DEPTH_CACHE_DIR or None,
+                 local_files_only=settings.DEPTH_OFFLINE, backend=settings.DEPTH_BACKEND,
+                 input_size=parse_size(settings.DEPTH_INPUT_SIZE), threads=settings.DEPTH_THREADS,
+                 quantize=settings.DEPTH_QUANTIZE, export_dir=settings.DEPTH_EXPORT_DIR):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown depth backend '{backend}', expected one of {BACKENDS}")
+        self.checkpoint = checkpoint
+        self.cache_dir = cache_dir
+        self.local_files_only = local_files_only
+        self.backend_name = backend
+        self.input_size = input_size
+        self.threads = threads
+        self.quantize = quantize
+        self.export_dir = export_dir
+        self.state = IDLE
+        self.error = None
+        self.load_seconds = None
+        self.image_processor = None
+        self.backend = None
+        self._torch = None
+        self._model = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._ready = threading.Event()
+        self.stats = perf_stats.get_stats('depth_model')
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    # Start loading unless already loading or loaded; a failed load is retried
+    def start(self):
+        with self._lock:
+            if self.state in (LOADING, READY):
+                return
+            self.state = LOADING
+            self.error = None
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._load, daemon=True)
+            self._thread.start()
+
+    def _load_torch(self):
+        if self._torch is None:
+            import torch
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            self._torch = torch
+        return self._torch
+
+    # The PyTorch model, loaded on first use; the ONNX backend only needs it to export
+    def _load_model(self):
+        with self._model_lock:
+            if self._model is None:
+                self._load_torch()
+                from transformers import AutoModelForDepthEstimation
+                self._model = AutoModelForDepthEstimation.from_pretrained(
+                    self.checkpoint, cache_dir=self.cache_dir, local_files_only=self.local_files_only)
+                self._model.eval()
+            return self._model
+
+    def _create_backend(self):
+        os.makedirs(self.export_dir, exist_ok=True)
+        export_path = os.path.join(self.export_dir, self.checkpoint.replace('/', '_'))
+        if self.backend_name == 'onnx':
+            return OnnxBackend(self._load_torch, self._load_model, export_path, self.threads, self.quantize)
+        torch = self._load_torch()
+        if self.backend_name == 'torchscript':
+            return TorchScriptBackend(torch, self._load_model, export_path, self.quantize)
+        return TorchBackend(torch, self._load_model, self.quantize)
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            from transformers import AutoImageProcessor
+            image_processor = AutoImageProcessor.from_pretrained(
+                self.checkpoint, cache_dir=self.cache_dir, local_files_only=self.local_files_only)
+            backend = self._create_backend()
+        except Exception as e:
+            self.error = e
+            self.state = FAILED
+            print(f"Could not load depth model {self.checkpoint}: {e}")
+            if self.local_files_only and not isinstance(e, ImportError):
+                print("The model is loaded from the local cache only; run once with HOLO_DEPTH_OFFLINE=0 to download it")
+        else:
+            self.image_processor = image_processor
+            self.backend = backend
+            self.load_seconds = time.perf_counter() - start
+            self.stats.add('load', self.load_seconds)
+            print(f"Loaded depth model {self.checkpoint} ({self.backend_name}) in {self.load_seconds:.1f}s")
+            self.state = READY
+        self._ready.set()
+
+    # Block until loading has finished (either way); True if the model is ready
+    def wait(self, timeout=None):
+        self._ready.wait(timeout)
+        return self.ready
+
+    # Predicted depth for a PIL image, as a float array at the image's size
+    def estimate(self, image):
+        if not self.ready:
+            raise RuntimeError(f"Depth model is not ready ({self.state})")
+        width, height = image.size
+        if self.input_size and self.input_size != image.size:
+            image = image.resize(self.input_size, Image.BICUBIC)
+        pixel_values = self.image_processor(image, return_tensors="np").pixel_values
+        pixel_values = np.ascontiguousarray(pixel_values, dtype=np.float32)
+
+        start = time.perf_counter()
+        depth = self.backend.predict(pixel_values)
+        self.stats.add('inference', time.perf_counter() - start)
+
+        torch = self._torch
+        if torch is None:
+            return cv2.resize(depth, (width, height), interpolation=cv2.INTER_CUBIC)
+        prediction = torch.nn.functional.interpolate(
+            torch.from_numpy(np.ascontiguousarray(depth))[None, None],
+            size=(height, width),
+            mode="bicubic",
+            align_corners=False,
+        ).squeeze()
+        return prediction.numpy()
+
+_service = None
+_service_lock = threading.Lock()
+
+# The process-wide service
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = DepthModelService()
+        return _service
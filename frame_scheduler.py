@@ -0,0 +1,58 @@
+import time
+import settings
+
+# Paces the UI loops. Instead of a fixed delay after every frame, tick()
+# sleeps only for whatever is left of the frame budget once the frame's work
+# is done, so loops run at a steady target rate without busy-spinning. When
+# no hand has been seen for idle_after seconds the scheduler drops to idle_fps
+# (and, if given a CameraManager, throttles hand inference as well) until a
+# hand shows up again.
+class FrameScheduler:
+    def __init__(self, target_fps=settings.TARGET_FPS, idle_fps=settings.IDLE_FPS,
+                 idle_after=settings.IDLE_AFTER, vsync=settings.VSYNC, camera_manager=None):
+        self.frame_interval = 1.0 / target_fps
+        self.idle_interval = 1.0 / idle_fps
+        self.idle_after = idle_after
+        self.vsync = vsync
+        self.camera_manager = camera_manager
+        self._deadline = None
+        self.reset()
+
+    # Call once per frame after presenting it. active tells the scheduler
+    # whether anything is going on (typically: is a hand in view).
+    def tick(self, active=True):
+        now = time.monotonic()
+        if active:
+            self._last_activity = now
+        idle = now - self._last_activity > self.idle_after
+        if idle != self.idle:
+            self.idle = idle
+            if self.camera_manager is not None:
+                self.camera_manager.set_idle(idle)
+
+        # With vsync the flip already waits for the display, so only idle
+        # frames need extra sleeping
+        if self.vsync and not idle:
+            self._deadline = None
+            return
+
+        interval = self.idle_interval if idle else self.frame_interval
+        if self._deadline is None:
+            self._deadline = now + interval
+        else:
+            self._deadline += interval
+            # Don't try to catch up after a long frame; just start a new budget
+            if self._deadline < now:
+                self._deadline = now
+        delay = self._deadline - now
+        if delay > 0:
+            time.sleep(delay)
+
+    # Forget the current budget and leave idle mode, e.g. after a blocking
+    # animation or when control returns from an app
+    def reset(self):
+        self.idle = False
+        self._deadline = None
+        self._last_activity = time.monotonic()
+        if self.camera_manager is not None:
+            self.camera_manager.set_idle(False)
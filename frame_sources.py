@@ -0,0 +1,216 @@
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from landmark_stream import LandmarkStreamReader
+
+VIDEO_EXTENSIONS = ('.avi', '.mp4', '.mkv', '.mov')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+LANDMARK_EXTENSION = '.lmk'
+
+# Stand-in for MediaPipe results when the landmarks come from a recording
+# instead of inference. CameraManager passes it through the pipeline in place
+# of a camera frame and skips hands.process() for it.
+class LandmarkFrame:
+    def __init__(self, image, landmarks, handedness=None, timestamp=None):
+        self.image = image
+        self.landmarks = landmarks  # (hands, 21, 2 or 3), normalized to the full frame
+        self.handedness = handedness
+        self.timestamp = timestamp
+        self.multi_hand_landmarks = None
+
+# Sleeps so that frames come out at the recorded rate. With realtime off,
+# wait() returns immediately and frames are produced as fast as possible.
+class Pacer:
+    def __init__(self, fps, realtime=True):
+        self.interval = 1.0 / fps if fps > 0 else 0
+        self.realtime = realtime
+        self._start = None
+        self._first_timestamp = None
+        self._count = 0
+
+    # Block until the next frame is due; timestamp, when given, is the frame's
+    # recorded capture time and takes precedence over the nominal frame rate
+    def wait(self, timestamp=None):
+        if not self.realtime:
+            return
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+            self._first_timestamp = timestamp
+        if timestamp is not None and self._first_timestamp is not None:
+            due = self._start + (timestamp - self._first_timestamp)
+        else:
+            due = self._start + self._count * self.interval
+        self._count += 1
+        if due > now:
+            time.sleep(due - now)
+
+    def reset(self):
+        self._start = None
+        self._count = 0
+
+# Common interface for everything CameraManager can read frames from.
+# read() follows cv2.VideoCapture: it returns (ret, frame).
+class FrameSource:
+    fps = 30
+    frame_size = (0, 0)
+    eof = False  # Set once a finite source has run out of frames
+    realtime = True  # Produces frames at its own rate (a live camera always does)
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+# Live camera device
+class CameraSource(FrameSource):
+    def __init__(self, index=1):
+        self.cap = cv2.VideoCapture(index)
+
+        # Get the frame rate from the camera
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if not self.fps > 0:
+            self.fps = 30  # Default to 30 FPS if the frame rate cannot be obtained
+        self.frame_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+# Recorded video file, e.g. original_feed.avi or a recorder segment
+class VideoFileSource(FrameSource):
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video file {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if not self.fps > 0:
+            self.fps = 30
+        self.frame_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.realtime = realtime
+        self.pacer = Pacer(self.fps, realtime)
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.pacer.reset()
+            ret, frame = self.cap.read()
+        if not ret:
+            self.eof = True
+            return False, None
+        self.pacer.wait()
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+# Directory of still images (or a glob pattern), played back in name order.
+# Frames are decoded on demand so long sequences don't have to fit in memory.
+class ImageSequenceSource(FrameSource):
+    def __init__(self, pattern, fps=30, realtime=True, loop=False):
+        if os.path.isdir(pattern):
+            paths = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                     if name.lower().endswith(IMAGE_EXTENSIONS)]
+        else:
+            paths = glob.glob(pattern)
+        self.paths = sorted(paths)
+        if not self.paths:
+            raise IOError(f"No images found for {pattern}")
+        self.fps = fps
+        self.loop = loop
+        self.realtime = realtime
+        self.pacer = Pacer(fps, realtime)
+        self._index = 0
+        first = next((image for image in map(cv2.imread, self.paths) if image is not None), None)
+        if first is None:
+            raise IOError(f"None of the images for {pattern} could be read")
+        self.frame_size = (first.shape[1], first.shape[0])
+
+    def read(self):
+        # Unreadable images are skipped; a pass without a single readable
+        # one ends the sequence even when looping
+        for _ in range(len(self.paths) + 1):
+            if self._index >= len(self.paths):
+                if not self.loop:
+                    break
+                self._index = 0
+                self.pacer.reset()
+            path = self.paths[self._index]
+            frame = cv2.imread(path)
+            self._index += 1
+            if frame is not None:
+                self.pacer.wait()
+                return True, frame
+            print(f"Skipping unreadable image {path}")
+        self.eof = True
+        return False, None
+
+# Replays recorded hand landmarks without any camera or inference. records is
+# an iterable of (timestamp, landmarks, handedness) tuples, landmarks being a
+# (hands, 21, 2 or 3) array normalized to a frame of frame_size. Every read()
+# yields a LandmarkFrame over a shared blank image. With loop, records has to
+# be iterable more than once (a list or a LandmarkStreamReader); every pass
+# continues the timeline of the previous one, so timestamps keep increasing.
+class LandmarkReplaySource(FrameSource):
+    def __init__(self, records, frame_size=(640, 480), fps=30, realtime=True, loop=False):
+        self.fps = fps
+        self.frame_size = frame_size
+        self.loop = loop
+        self.realtime = realtime
+        self.pacer = Pacer(fps, realtime)
+        self._all_records = records
+        self._records = iter(records)
+        self._image = np.zeros((frame_size[1], frame_size[0], 3), dtype=np.uint8)
+        self._first_timestamp = None
+        self._last_timestamp = None
+        self._offset = 0.0
+
+    def read(self):
+        record = next(self._records, None)
+        if record is None and self.loop and self._first_timestamp is not None:
+            self._offset += float(self._last_timestamp - self._first_timestamp + 1.0 / self.fps)
+            self._records = iter(self._all_records)
+            record = next(self._records, None)
+        if record is None:
+            self.eof = True
+            return False, None
+        timestamp, landmarks, handedness = record
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        self._last_timestamp = timestamp
+        timestamp += self._offset
+        self.pacer.wait(timestamp)
+        return True, LandmarkFrame(self._image, landmarks, handedness, timestamp)
+
+# Build a frame source from a spec string: a camera index ("1"), a video file,
+# an image directory or glob pattern, or a recorded landmark stream (.lmk)
+def open_frame_source(spec, realtime=True, loop=False):
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if spec.lower().endswith(LANDMARK_EXTENSION):
+        reader = LandmarkStreamReader(spec)
+        return LandmarkReplaySource(reader, frame_size=reader.frame_size, fps=reader.fps, realtime=realtime,
+                                    loop=loop)
+    if spec.lower().endswith(VIDEO_EXTENSIONS):
+        return VideoFileSource(spec, realtime=realtime, loop=loop)
+    if os.path.isdir(spec) or glob.has_magic(spec):
+        return ImageSequenceSource(spec, realtime=realtime, loop=loop)
+    raise ValueError(f"Don't know how to open frame source '{spec}'")
+
+# open_frame_source for tools that run their own hand detection and so need
+# real images; a landmark recording has none
+def open_image_source(spec, realtime=True, loop=False):
+    if str(spec).lower().endswith(LANDMARK_EXTENSION):
+        raise ValueError(f"'{spec}' is a landmark recording, this tool needs camera or video frames")
+    return open_frame_source(spec, realtime=realtime, loop=loop)
@@ -0,0 +1,143 @@
+import time
+import numpy as np
+import settings
+
+# Gesture recognition shared by the home screen and the apps.
+#
+# A GestureEngine is fed the transformed landmarks once per frame and turns
+# them into events. Each hand has its own small state machine: what its index
+# fingertip is over (hover enter/leave, dwell, and a tap when the finger
+# slides off a target again) and whether thumb and index finger are pinched
+# (pinch start/move/end). Fingertip positions, pinch distances and hit tests
+# for all hands are worked out together with a few array operations, so apps
+# no longer recompute them per hand. Thresholds live in settings, so gesture
+# latency is tuned in one place.
+
+THUMB_TIP = 4
+INDEX_FINGER_TIP = 8
+
+# Event types
+HOVER_ENTER = 'hover_enter'  # The index fingertip moved onto target
+HOVER_LEAVE = 'hover_leave'  # ... and off it again (or the hand was lost)
+DWELL = 'dwell'  # The fingertip has rested on target for dwell_time
+TAP = 'tap'  # The fingertip slid off target, at most once per tap_cooldown
+PINCH_START = 'pinch_start'  # Thumb and index finger came together at pos
+PINCH_MOVE = 'pinch_move'  # The pinch moved to pos
+PINCH_END = 'pinch_end'  # The pinch was released (or the hand was lost) at pos
+
+class GestureEvent:
+    def __init__(self, type, hand, pos, target=None, time=0.0):
+        self.type = type
+        self.hand = hand  # Index of the hand in the landmark list
+        self.pos = pos  # Fingertip (hover events) or pinch midpoint (pinch events), in screen pixels
+        self.target = target  # Hit-index target the event refers to, if any
+        self.time = time
+
+    def __repr__(self):
+        return f'GestureEvent({self.type}, hand={self.hand}, pos={self.pos}, target={self.target!r})'
+
+# Everything the engine knows about one hand, as of the last update
+class HandState:
+    def __init__(self, index):
+        self.index = index
+        self.present = False
+        self.pos = None  # Index fingertip
+        self.thumb = None  # Thumb tip
+        self.pinch_pos = None  # Midpoint between the two
+        self.pinch_distance = None
+        self.target = None  # What the fingertip is over
+        self.hover_start = None
+        self.dwelled = False
+        self.pinching = False
+        self.pinch_start = None
+
+class GestureEngine:
+    def __init__(self, hit_index=None, max_hands=2, pinch_distance=settings.GESTURE_PINCH_DISTANCE,
+                 release_distance=settings.GESTURE_RELEASE_DISTANCE, pinch_hold=settings.GESTURE_PINCH_HOLD,
+                 dwell_time=settings.GESTURE_DWELL_TIME, tap_cooldown=settings.BUTTON_COOLDOWN):
+        self.hit_index = hit_index
+        self.pinch_distance = pinch_distance  # Closer than this starts a pinch
+        self.release_distance = release_distance  # Farther than this ends it at once
+        self.pinch_hold = pinch_hold  # In between, the pinch ends after this long
+        self.dwell_time = dwell_time
+        self.tap_cooldown = tap_cooldown
+        self.hands = [HandState(i) for i in range(max_hands)]
+        self._last_tap = float('-inf')
+
+    # Process one frame's transformed landmarks (a list of (21, 2) arrays, or
+    # None when no hand is in view) and return the events it produced
+    def update(self, landmarks, now=None):
+        now = time.monotonic() if now is None else now
+        events = []
+        count = min(len(landmarks), len(self.hands)) if landmarks else 0
+        if count:
+            tips = np.asarray(landmarks[:count])[:, (THUMB_TIP, INDEX_FINGER_TIP)].astype(np.int64)
+            thumbs, fingers = tips[:, 0], tips[:, 1]
+            midpoints = (thumbs + fingers) // 2
+            distances = np.hypot(*(thumbs - fingers).T)
+            targets = self.hit_index.at_many(fingers) if self.hit_index is not None else [None] * count
+            for i in range(count):
+                self._update_hand(self.hands[i], tuple(fingers[i].tolist()), tuple(thumbs[i].tolist()),
+                                  tuple(midpoints[i].tolist()), float(distances[i]), targets[i], now, events)
+        for hand in self.hands[count:]:
+            if hand.present:
+                self._lose_hand(hand, now, events)
+        return events
+
+    def _update_hand(self, hand, pos, thumb, pinch_pos, distance, target, now, events):
+        hand.present = True
+        hand.pos = pos
+        hand.thumb = thumb
+        hand.pinch_distance = distance
+
+        if target != hand.target:
+            if hand.target is not None:
+                events.append(GestureEvent(HOVER_LEAVE, hand.index, pos, hand.target, now))
+                if now - self._last_tap > self.tap_cooldown:
+                    events.append(GestureEvent(TAP, hand.index, pos, hand.target, now))
+                    self._last_tap = now
+            if target is not None:
+                events.append(GestureEvent(HOVER_ENTER, hand.index, pos, target, now))
+            hand.target = target
+            hand.hover_start = now
+            hand.dwelled = False
+        elif target is not None and not hand.dwelled and now - hand.hover_start >= self.dwell_time:
+            events.append(GestureEvent(DWELL, hand.index, pos, target, now))
+            hand.dwelled = True
+
+        if distance < self.pinch_distance:
+            if not hand.pinching:
+                hand.pinching = True
+                hand.pinch_start = now
+                events.append(GestureEvent(PINCH_START, hand.index, pinch_pos, target, now))
+            elif pinch_pos != hand.pinch_pos:
+                events.append(GestureEvent(PINCH_MOVE, hand.index, pinch_pos, target, now))
+        elif hand.pinching and (distance > self.release_distance or now - hand.pinch_start > self.pinch_hold):
+            hand.pinching = False
+            events.append(GestureEvent(PINCH_END, hand.index, hand.pinch_pos, target, now))
+        hand.pinch_pos = pinch_pos
+
+    # The hand went out of view: close whatever it had going. Losing a hand
+    # is not a tap.
+    def _lose_hand(self, hand, now, events):
+        if hand.target is not None:
+            events.append(GestureEvent(HOVER_LEAVE, hand.index, hand.pos, hand.target, now))
+        if hand.pinching:
+            events.append(GestureEvent(PINCH_END, hand.index, hand.pinch_pos, hand.target, now))
+        self.hands[hand.index] = HandState(hand.index)
+
+    # Hit-index targets under any fingertip right now, in hand order
+    def hovered(self):
+        targets = []
+        for hand in self.hands:
+            if hand.target is not None and hand.target not in targets:
+                targets.append(hand.target)
+        return targets
+
+    # Fingertip of the last hand in view, for single-pointer apps
+    def pointer(self):
+        pos = None
+        for hand in self.hands:
+            if hand.present:
+                pos = hand.pos
+        return pos
@@ -0,0 +1,113 @@
+import cv2
+import numpy as np
+import settings
+
+# Detect-then-track: MediaPipe runs only every detect_interval frames and the
+# landmarks it found are carried through the frames in between with
+# pyramidal Lucas-Kanade optical flow, which costs a few milliseconds instead
+# of a full hand inference.
+#
+# Every tracked point is checked by tracking it back to the previous frame
+# (forward-backward error). Points that fail follow the median motion of
+# their hand; if too many of a hand's points fail, the tracker gives up and
+# the caller runs detection on that frame instead.
+
+# Stand-in for MediaPipe results on tracked frames. landmarks is a
+# (hands, 21, 3) array normalized to the inference crop, like MediaPipe's.
+class TrackedHands:
+    def __init__(self, landmarks, handedness=None, quality=1.0):
+        self.landmarks = landmarks
+        self.multi_hand_landmarks = None
+        self.multi_handedness = handedness  # From the last detection
+        self.quality = quality  # Fraction of points that tracked cleanly
+
+class LandmarkTracker:
+    def __init__(self, detect_interval=settings.TRACK_DETECT_INTERVAL, min_quality=settings.TRACK_MIN_QUALITY,
+                 max_error=settings.TRACK_MAX_ERROR, win_size=21, max_level=3):
+        self.detect_interval = detect_interval
+        self.min_quality = min_quality  # Detect again once fewer of a hand's points track cleanly
+        self.max_error = max_error  # Forward-backward error (pixels) above which a point failed
+        self.lk_params = dict(winSize=(win_size, win_size), maxLevel=max_level,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self._gray = None
+        self._points = None  # (hands, 21, 2) pixel positions in the crop
+        self._depth = None  # (hands, 21) z from the last detection
+        self._handedness = None
+        self._since_detection = 0
+
+        # Quality metrics (see stats())
+        self.detections = 0
+        self.tracked = 0
+        self.fallbacks = 0
+        self._quality_sum = 0.0
+        self._error_sum = 0.0
+
+    # Whether the next frame has to go through MediaPipe
+    def needs_detection(self):
+        return self._points is None or self._since_detection + 1 >= self.detect_interval
+
+    # Start tracking from a detection on gray. landmarks is a (hands, 21, 3)
+    # array normalized to gray's size.
+    def detected(self, gray, landmarks, handedness=None):
+        self.detections += 1
+        self._gray = gray
+        self._since_detection = 0
+        if len(landmarks) == 0:
+            self._points = None  # Nothing to track; keep detecting
+            return
+        height, width = gray.shape
+        self._points = (landmarks[..., :2] * (width, height)).astype(np.float32)
+        self._depth = landmarks[..., 2].copy()
+        self._handedness = handedness
+
+    # Move the landmarks onto gray. Returns TrackedHands, or None when
+    # tracking was lost and the frame needs a detection.
+    def track(self, gray):
+        if gray.shape != self._gray.shape:
+            self._points = None  # The crop changed size; start over
+            return None
+        points = self._points.reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, points, None, **self.lk_params)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, moved, None, **self.lk_params)
+        error = np.linalg.norm((back - points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < self.max_error)
+
+        hands = self._points.shape[0]
+        good = good.reshape(hands, 21)
+        if (good.mean(axis=1) < self.min_quality).any():
+            self.fallbacks += 1
+            self._points = None
+            return None
+
+        # Points that failed move along with the rest of their hand
+        moved = moved.reshape(hands, 21, 2)
+        for hand in range(hands):
+            bad = ~good[hand]
+            if bad.any():
+                shift = np.median(moved[hand][good[hand]] - self._points[hand][good[hand]], axis=0)
+                moved[hand][bad] = self._points[hand][bad] + shift
+
+        self._points = moved
+        self._gray = gray
+        self._since_detection += 1
+        quality = float(good.mean())
+        self.tracked += 1
+        self._quality_sum += quality
+        self._error_sum += float(error[good.ravel()].mean())
+
+        height, width = gray.shape
+        landmarks = np.empty((hands, 21, 3), dtype=np.float32)
+        landmarks[..., :2] = moved / (width, height)
+        landmarks[..., 2] = self._depth
+        return TrackedHands(landmarks, self._handedness, quality)
+
+    def stats(self):
+        frames = self.tracked + self.detections
+        return {
+            'detections': self.detections,
+            'tracked': self.tracked,
+            'fallbacks': self.fallbacks,
+            'tracked_fraction': self.tracked / frames if frames else 0.0,
+            'quality': self._quality_sum / self.tracked if self.tracked else 0.0,
+            'error': self._error_sum / self.tracked if self.tracked else 0.0,
+        }
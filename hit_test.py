@@ -0,0 +1,95 @@
+import numpy as np
+
+# Answers "what is under this point" with a single array lookup.
+#
+# Every registered shape (rectangle or circle) is painted into a raster the
+# size of the screen holding the index of the target on top at each pixel,
+# so a query costs the same no matter how many widgets there are. Painting
+# happens when shapes are added, moved or removed, which is rare compared to
+# the per-frame queries. Later shapes win where they overlap.
+
+class HitIndex:
+    def __init__(self, size):
+        width, height = size
+        self.raster = np.full((height, width), -1, dtype=np.int16)
+        self._targets = []  # raster value -> target
+        self._shapes = []  # raster value -> ('rect', (x, y, w, h)) or ('circle', (cx, cy, r)); None once removed
+
+    # Register target under a rect (x, y, w, h) or a circle (center, radius)
+    def add(self, target, rect=None, center=None, radius=None):
+        shape = self._shape(rect, center, radius)
+        self._targets.append(target)
+        self._shapes.append(shape)
+        self._paint(len(self._shapes) - 1, shape)
+
+    # Register a ui.Button (or anything with shape and shape_rect) under itself
+    def add_widget(self, widget, target=None):
+        target = widget if target is None else target
+        if widget.shape == 'circle':
+            self.add(target, center=widget.shape_rect.center, radius=widget.shape_rect.width // 2)
+        else:
+            self.add(target, rect=widget.shape_rect)
+
+    def move(self, target, rect=None, center=None, radius=None):
+        index = self._targets.index(target)
+        self._shapes[index] = self._shape(rect, center, radius)
+        self._rebuild()
+
+    def remove(self, target):
+        index = self._targets.index(target)
+        self._targets[index] = None
+        self._shapes[index] = None
+        self._rebuild()
+
+    def clear(self):
+        self._targets = []
+        self._shapes = []
+        self.raster.fill(-1)
+
+    def _shape(self, rect, center, radius):
+        if rect is not None:
+            x, y, w, h = rect
+            return ('rect', (int(x), int(y), int(w), int(h)))
+        return ('circle', (int(center[0]), int(center[1]), int(radius)))
+
+    def _paint(self, index, shape):
+        height, width = self.raster.shape
+        kind, params = shape
+        if kind == 'rect':
+            x, y, w, h = params
+            self.raster[max(y, 0):max(min(y + h, height), 0), max(x, 0):max(min(x + w, width), 0)] = index
+            return
+        cx, cy, r = params
+        x0, x1 = max(cx - r, 0), min(cx + r + 1, width)
+        y0, y1 = max(cy - r, 0), min(cy + r + 1, height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        ys, xs = np.ogrid[y0:y1, x0:x1]
+        mask = (xs - cx) ** 2 + (ys - cy) ** 2 <= r * r
+        self.raster[y0:y1, x0:x1][mask] = index
+
+    def _rebuild(self):
+        self.raster.fill(-1)
+        for index, shape in enumerate(self._shapes):
+            if shape is not None:
+                self._paint(index, shape)
+
+    # Target under pos, or None
+    def at(self, pos):
+        if pos is None:
+            return None
+        x, y = int(pos[0]), int(pos[1])
+        height, width = self.raster.shape
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+        index = self.raster[y, x]
+        return self._targets[index] if index >= 0 else None
+
+    # Targets under each of an (n, 2) array of points (e.g. every fingertip at once)
+    def at_many(self, points):
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        height, width = self.raster.shape
+        inside = (points[:, 0] >= 0) & (points[:, 0] < width) & (points[:, 1] >= 0) & (points[:, 1] < height)
+        indices = np.full(len(points), -1, dtype=np.int64)
+        indices[inside] = self.raster[points[inside, 1], points[inside, 0]]
+        return [self._targets[i] if i >= 0 else None for i in indices]
@@ -4,12 +4,18 @@ import time
 import os
 import sys
 import math
+import glob
 from camera_manager import CameraManager
-import apps.app_2
-
-# Initialize Pygame and mixer
-pygame.init()
-mixer.init()
+import perf_stats
+import assets
+import sound_engine
+import settings
+from frame_scheduler import FrameScheduler
+from ui import Widget, Cursor, RenderLayer
+from hit_test import HitIndex
+from gestures import GestureEngine, HOVER_ENTER
+import text_cache
+import app_registry
 
 # Define constants
 SCREEN_SIZE = (1024, 768)
@@ -21,70 +27,89 @@ APP_SELECT_DELAY = 1.0  # Delay to prevent immediate app launch
 SELECTION_ANIMATION_DURATION = 0.3  # Duration of the selection animation in seconds
 
 # Function to play sound
-def play_sound(file_path):
-    mixer.music.load(file_path)
-    mixer.music.play()
+def play_sound(file_path, priority=sound_engine.NORMAL):
+    sound_engine.play(file_path, priority)
 
 # AppCircle class definition
-class AppCircle:
+class AppCircle(Widget):
     def __init__(self, center, radius, app_index, is_main=False):
-        self.center = center
+        self._center = center
         self.radius = radius
         self.app_index = app_index
         self.text = 'Home' if is_main else f'App {app_index}'
-        self.hover_time = 0
         self.is_hovered_flag = False
         self.is_main = is_main
-        self.visible = is_main
         self.image = self.load_image()
         self.home_pos = center  # Store the home position for animation
         self.grid_pos = center  # Store the grid position for animation
         self.selection_start_time = None
         self.is_selected = False
+        super().__init__(self.get_bounds())
+        self.visible = is_main
+
+    # Moving the circle updates its bounds and schedules a redraw
+    @property
+    def center(self):
+        return self._center
+
+    @center.setter
+    def center(self, center):
+        if center != self._center:
+            self._center = center
+            self.rect = self.get_bounds()
+            self.dirty = True
+
+    # Screen area covered by the circle, its hover outline and the label below it
+    def get_bounds(self):
+        x, y = self._center
+        r = self.radius
+        rect = pygame.Rect(x - r - 1, y - r - 1, r * 2 + 3, r * 2 + 3)
+        if not self.is_main:
+            rect.union_ip(pygame.Rect(x - r, y + r, r * 2, 40))
+        return rect
 
     # Load image for the app circle
     def load_image(self):
         if self.is_main:
             return None  # No image for home circle
         else:
-            image_path = f'resources/app_{self.app_index}.jpg'
+            spec = app_registry.get(self.app_index)
+            image_path = spec.icon if spec and spec.icon else f'resources/app_{self.app_index}.jpg'
         
         if os.path.exists(image_path):
-            image = pygame.image.load(image_path)
-            return pygame.transform.scale(image, (int(self.radius * 2), int(self.radius * 2)))
+            return assets.image(image_path, (int(self.radius * 2), int(self.radius * 2)))
         return None
 
     # Draw the app circle
     def draw(self, screen):
-        if self.visible:
-            if self.is_main:
-                color = self.get_animated_color() if self.is_selected else NAVY_BLUE
-                pygame.draw.circle(screen, color, self.center, self.radius, 3)  # Outline for home circle
-                font = pygame.font.Font(None, 36)  # Larger font for home text
-                text_surface = font.render(self.text, True, color)
-                text_rect = text_surface.get_rect(center=self.center)
-                screen.blit(text_surface, text_rect)
+        if self.is_main:
+            color = self.get_animated_color() if self.is_selected else NAVY_BLUE
+            pygame.draw.circle(screen, color, self.center, self.radius, 3)  # Outline for home circle
+            font = text_cache.get_font(36)  # Larger font for home text
+            text_surface = text_cache.render(self.text, font, color)
+            text_rect = text_surface.get_rect(center=self.center)
+            screen.blit(text_surface, text_rect)
+        else:
+            if self.image:
+                image_rect = self.image.get_rect(center=self.center)
+                screen.blit(self.image, image_rect)
+                if self.is_selected:
+                    overlay = pygame.Surface((image_rect.width, image_rect.height), pygame.SRCALPHA)
+                    overlay_color = self.get_animated_color()
+                    overlay.fill((*overlay_color[:3], 128))  # Semi-transparent overlay
+                    screen.blit(overlay, image_rect)
             else:
-                if self.image:
-                    image_rect = self.image.get_rect(center=self.center)
-                    screen.blit(self.image, image_rect)
-                    if self.is_selected:
-                        overlay = pygame.Surface((image_rect.width, image_rect.height), pygame.SRCALPHA)
-                        overlay_color = self.get_animated_color()
-                        overlay.fill((*overlay_color[:3], 128))  # Semi-transparent overlay
-                        screen.blit(overlay, image_rect)
-                else:
-                    color = self.get_animated_color() if self.is_selected else LIGHT_BLUE
-                    pygame.draw.circle(screen, color, self.center, self.radius)
-            
-            if self.is_hovered_flag:
-                pygame.draw.circle(screen, LIGHT_BLUE, self.center, self.radius, 3)
-
-            if not self.is_main:
-                font = pygame.font.Font(None, 24)
-                text_surface = font.render(self.text, True, (255, 255, 255))
-                text_rect = text_surface.get_rect(center=(self.center[0], self.center[1] + self.radius + 20))
-                screen.blit(text_surface, text_rect)
+                color = self.get_animated_color() if self.is_selected else LIGHT_BLUE
+                pygame.draw.circle(screen, color, self.center, self.radius)
+
+        if self.is_hovered_flag:
+            pygame.draw.circle(screen, LIGHT_BLUE, self.center, self.radius, 3)
+
+        if not self.is_main:
+            font = text_cache.get_font(24)
+            text_surface = text_cache.render(self.text, font, WHITE)
+            text_rect = text_surface.get_rect(center=(self.center[0], self.center[1] + self.radius + 20))
+            screen.blit(text_surface, text_rect)
 
     def get_animated_color(self):
         if self.selection_start_time is None:
@@ -179,11 +204,33 @@ def run_home_screen(screen, camera_manager):
     last_toggle_time = 0
     last_app_select_time = 0
 
+    # Only circles whose state changed, and the cursor, are repainted each frame
+    layer = RenderLayer(screen)
+    layer.add(*circles)
+    cursor = layer.add(Cursor(15, LIGHT_BLUE, 3))
+    layer.add_overlay(perf_stats.draw_hud)
+
+    # Visible circles at their current positions, for looking up what a finger is on
+    hit_index = HitIndex(SCREEN_SIZE)
+    def index_circles():
+        hit_index.clear()
+        for circle in circles:
+            if circle.visible:
+                hit_index.add(circle, center=circle.center, radius=circle.radius)
+    index_circles()
+    gestures = GestureEngine(hit_index, camera_manager.max_num_hands)
+
     index_finger_pos = None
-    play_sound("./audio/startup.wav")
+    play_sound("./audio/startup.wav", sound_engine.HIGH)
+    timer = perf_stats.frame_timer('home_screen')
+    scheduler = FrameScheduler(camera_manager=camera_manager)
     while running:
+        timer.start()
         if not camera_manager.update():
+            if camera_manager.finished:
+                break  # The frame source ran out (file or replay input)
             continue
+        timer.lap('camera')
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -191,69 +238,80 @@ def run_home_screen(screen, camera_manager):
                 camera_manager.release()
                 sys.exit()
 
-        screen.fill((0, 0, 0))
+        transformed_landmarks = camera_manager.get_transformed_landmarks()
+        for event in gestures.update(transformed_landmarks):
+            if event.type == HOVER_ENTER and event.target is home_circle:
+                print("Home circle hovered")
+                play_sound("./audio/home.wav")
+        index_finger_pos = gestures.pointer() or index_finger_pos
+
+        # Circles act for as long as a finger rests on them, paced by the delays
+        hovered_circles = gestures.hovered()
+        for circle in hovered_circles:
+            if circle.is_main:
+                if time.time() - last_toggle_time > HOME_TOGGLE_DELAY:
+                    apps_visible = not apps_visible
+                    print(f"Toggling apps visibility to: {apps_visible}")
+                    last_toggle_time = time.time()
+                    circle.start_selection_animation()
+                    for app_circle in circles[1:]:
+                        app_circle.show(apps_visible)
+                    for _ in animate_circles(circles, apps_visible):
+                        circle.mark_dirty()
+                        layer.present()
+                        scheduler.tick()
+                    index_circles()
+                    if apps_visible:
+                        app_registry.warm_up_likely()
+                    # Set last_app_select_time to ensure delay before selecting app
+                    last_app_select_time = time.time() + APP_SELECT_DELAY
+            elif circle.visible and apps_visible:
+                if time.time() <= last_app_select_time:
+                    app_registry.warm_up(circle.app_index)  # Likely to be opened next
+                else:
+                    print(f"Circle {circle.app_index} hovered with visibility {circle.visible}")
+                    circle.start_selection_animation()
+                    try:
+                        app = f'app_{circle.app_index}'
+                        print(f"Launching app: {app}")
+                        run_app = app_registry.entry(circle.app_index)
+                        play_sound("./audio/confirmation.wav", sound_engine.HIGH)
+                        run_app(screen, camera_manager)  # Pass camera_manager to the app
+                        last_app_select_time = time.time()
+                        scheduler.reset()
+                        layer.invalidate()  # The app drew over the whole screen
+                    except ModuleNotFoundError:
+                        print(f"Module 'apps.{app}' not found.")
+                        play_sound("./audio/reject.wav", sound_engine.HIGH)
 
         for circle in circles:
-            circle.is_hovered_flag = False
-            circle.draw(screen)
+            circle.set(is_hovered_flag=circle in hovered_circles)
+            if circle.is_selected:
+                circle.mark_dirty()  # Selection animation in progress
+        cursor.move(index_finger_pos)
 
-        transformed_landmarks = camera_manager.get_transformed_landmarks()
-        if transformed_landmarks:
-            for transformed_coords in transformed_landmarks:
-                index_finger_tip = transformed_coords[camera_manager.mp_hands.HandLandmark.INDEX_FINGER_TIP]
-                screen_x = int(index_finger_tip[0])
-                screen_y = int(index_finger_tip[1])
-                index_finger_pos = (screen_x, screen_y)
-
-                for circle in circles:
-                    if circle.is_hovered((screen_x, screen_y)):
-                        circle.is_hovered_flag = True
-                        if circle.is_main:
-                            print("Home circle hovered")
-                            play_sound("./audio/home.wav")
-                            if time.time() - last_toggle_time > HOME_TOGGLE_DELAY:
-                                apps_visible = not apps_visible
-                                print(f"Toggling apps visibility to: {apps_visible}")
-                                last_toggle_time = time.time()
-                                circle.start_selection_animation()
-                                for app_circle in circles[1:]:
-                                    app_circle.visible = apps_visible
-                                for _ in animate_circles(circles, apps_visible):
-                                    screen.fill((0, 0, 0))
-                                    for circle in circles:
-                                        circle.draw(screen)
-                                    pygame.display.flip()
-                                    pygame.time.delay(16)  # ~60 FPS
-                                # Set last_app_select_time to ensure delay before selecting app
-                                last_app_select_time = time.time() + APP_SELECT_DELAY
-                        elif circle.visible and apps_visible:
-                            if time.time() > last_app_select_time:
-                                print(f"Circle {circle.app_index} hovered with visibility {circle.visible}")
-                                circle.start_selection_animation()
-                                try:
-                                    app = f'app_{circle.app_index}'
-                                    print(f"Launching app: {app}")
-                                    mod = __import__(f'apps.{app}', fromlist=[''])
-                                    play_sound("./audio/confirmation.wav")
-                                    mod.run(screen, camera_manager)  # Pass camera_manager to the app
-                                    last_app_select_time = time.time()
-                                except ModuleNotFoundError:
-                                    print(f"Module 'apps.{app}' not found.")
-                                    play_sound("./audio/reject.wav")
-                    else:
-                        circle.hover_time = time.time() if circle.visible else 0
-
-        if index_finger_pos:
-            pygame.draw.circle(screen, LIGHT_BLUE, index_finger_pos, 15, 3)
-
-        pygame.display.flip()
-        pygame.time.delay(50)
+        timer.lap('input')
+        layer.present()
+        timer.lap('present')
+        scheduler.tick(active=transformed_landmarks is not None)
+        timer.lap('delay')
+        timer.stop()
 
 
 # Main execution
 if __name__ == '__main__':
+    # Initialize Pygame and mixer here rather than on import: inference worker
+    # processes re-import this module and have no use for a display or audio
+    pygame.init()
+    mixer.init()
     os.environ['SDL_VIDEO_WINDOW_POS'] = '-1024,0'
-    screen = pygame.display.set_mode(SCREEN_SIZE)
+    # Load sounds and app icons while the display and camera come up
+    assets.prefetch(glob.glob('audio/*.wav') + glob.glob('resources/app_*.jpg'))
+    if settings.VSYNC:
+        screen = pygame.display.set_mode(SCREEN_SIZE, pygame.SCALED, vsync=1)
+    else:
+        screen = pygame.display.set_mode(SCREEN_SIZE)
     pygame.display.set_caption('Home Screen')
     camera_manager = CameraManager('./M.npy', 1024, 768)
-    run_home_screen(screen, camera_manager)
\ No newline at end of file
+    run_home_screen(screen, camera_manager)
+    camera_manager.release()
\ No newline at end of file
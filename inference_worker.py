@@ -0,0 +1,306 @@
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import cv2
+import numpy as np
+from hand_tracker import TrackedHands
+
+# Hand inference in separate processes, so MediaPipe gets cores of its own
+# instead of sharing the interpreter with pygame rendering.
+#
+# Frames travel through shared memory rather than being pickled: each worker
+# owns a slot in a FrameRing, the dispatcher copies a camera frame into the
+# slot of the next idle worker (round-robin) and sends it a few bytes naming
+# the frame, and the worker runs MediaPipe on a view of the slot without any
+# copy. The landmarks come back the same way through a ResultSlots block,
+# written under a sequence lock, and a one-byte message on the worker's done
+# pipe tells the collector a result is ready.
+
+FRAME_HEADER_SIZE = 64
+FRAME_HEADER_DTYPE = np.dtype({
+    'names': ['seq', 'capture_time'],
+    'formats': ['<i8', '<f8'],
+    'offsets': [0, 8],
+    'itemsize': 16,
+})
+
+def result_dtype(max_hands):
+    return np.dtype({
+        'names': ['seq', 'frame', 'inference_time', 'count', 'handedness', 'landmarks'],
+        'formats': ['<i8', '<i8', '<f8', '<i4', ('u1', (max_hands,)), ('<f4', (max_hands, 21, 3))],
+        'offsets': [0, 8, 16, 24, 28, 32],
+        'itemsize': 32 + max_hands * 21 * 3 * 4,
+    })
+
+# Results produced by a worker process; landmarks are normalized to the
+# inference crop like MediaPipe's, handedness holds landmark_stream codes
+class RemoteHands(TrackedHands):
+    def __init__(self, landmarks, handedness, inference_time):
+        super().__init__(landmarks)
+        self.handedness = handedness
+        self.inference_time = inference_time
+
+# One frame buffer per slot in a shared memory block, preceded by a header
+# row per slot with the sequence number of the frame it holds. Created by the
+# dispatching process (name=None) and attached to by the workers.
+class FrameRing:
+    def __init__(self, slots, frame_shape, name=None):
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        header_bytes = -(-slots * FRAME_HEADER_DTYPE.itemsize // FRAME_HEADER_SIZE) * FRAME_HEADER_SIZE
+        frame_bytes = int(np.prod(self.frame_shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + slots * frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.header = np.ndarray((slots,), FRAME_HEADER_DTYPE, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots,) + self.frame_shape, np.uint8, buffer=self.shm.buf, offset=header_bytes)
+
+    def write(self, slot, frame, seq, capture_time):
+        self.header['seq'][slot] = -1  # Being written
+        self.frames[slot] = frame
+        self.header['capture_time'][slot] = capture_time
+        self.header['seq'][slot] = seq
+
+    def close(self):
+        self.header = self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+# One result record per worker. Writers bump seq to an odd value, fill the
+# record and bump it to even again; readers retry when seq was odd or
+# changed while they copied (a sequence lock).
+class ResultSlots:
+    def __init__(self, slots, max_hands, name=None):
+        self.dtype = result_dtype(max_hands)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.dtype.itemsize)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.records = np.ndarray((slots,), self.dtype, buffer=self.shm.buf)
+
+    def write(self, slot, frame, landmarks, handedness, inference_time):
+        records = self.records
+        records['seq'][slot] += 1
+        count = len(landmarks)
+        records['frame'][slot] = frame
+        records['inference_time'][slot] = inference_time
+        records['count'][slot] = count
+        records['landmarks'][slot, :count] = landmarks
+        records['handedness'][slot, :count] = handedness
+        records['seq'][slot] += 1
+
+    # A consistent copy of slot's record, or None if it kept changing
+    def read(self, slot, attempts=100):
+        records = self.records
+        for _ in range(attempts):
+            seq = int(records['seq'][slot])
+            if seq % 2 == 0:
+                record = records[slot:slot + 1].copy()[0]
+                if int(records['seq'][slot]) == seq:
+                    return record
+            time.sleep(0)
+        return None
+
+    def close(self):
+        self.records = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+# Worker process: wait for a frame number on jobs, run MediaPipe on the
+# frame in this worker's ring slot, write the landmarks to its result slot
+# and ring the done pipe
+def _worker_main(index, ring_name, slots, frame_shape, results_name, max_hands, roi_scale, jobs, done):
+    import mediapipe as mp
+    from camera_manager import extract_landmarks, extract_handedness
+
+    ring = FrameRing(slots, frame_shape, name=ring_name)
+    results = ResultSlots(slots, max_hands, name=results_name)
+    hands = mp.solutions.hands.Hands(static_image_mode=False,
+                                     max_num_hands=max_hands,
+                                     min_detection_confidence=0.1,
+                                     min_tracking_confidence=0.1)
+    points = np.zeros((max_hands, 21, 3), dtype=np.float32)
+    handedness = np.zeros(max_hands, dtype=np.uint8)
+    try:
+        while True:
+            job = jobs.recv()
+            if job is None:
+                break
+            seq, (x0, y0, x1, y1) = job
+            started = time.perf_counter()
+            roi_frame = ring.frames[index, y0:y1, x0:x1]  # A view into shared memory
+            if roi_scale != 1.0:
+                roi_frame = cv2.resize(roi_frame, None, fx=roi_scale, fy=roi_scale, interpolation=cv2.INTER_AREA)
+            output = hands.process(cv2.cvtColor(roi_frame, cv2.COLOR_BGR2RGB))
+            count = extract_landmarks(output, points)
+            extract_handedness(output, handedness[:count])
+            # The dispatcher never rewrites a busy worker's slot, but say so if it did
+            if ring.header['seq'][index] != seq:
+                count = 0
+            results.write(index, seq, points[:count], handedness[:count], time.perf_counter() - started)
+            done.send_bytes(b'.')
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        hands.close()
+        ring.close()
+        results.close()
+
+# A pool of inference worker processes. submit() hands a frame to the next
+# idle worker; collect() returns the results that have come back since.
+class InferenceWorkers:
+    def __init__(self, workers, max_hands=2, roi_scale=1.0):
+        self.workers = workers
+        self.max_hands = max_hands
+        self.roi_scale = roi_scale
+        self.ring = None
+        self.results = None
+        self.processes = []
+        self._jobs = []
+        self._done = []
+        self._busy = [None] * workers  # Per worker: (seq, frame, capture_time) in flight
+        self._alive = [False] * workers
+        self._next = 0
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.submitted = 0
+        self.completed = 0
+        self.skipped = 0
+
+    # Allocate shared memory for frames of frame_shape and start the
+    # workers. Spawned rather than forked, so they don't inherit the
+    # camera, display and threads of this process.
+    def start(self, frame_shape):
+        context = multiprocessing.get_context('spawn')
+        self.ring = FrameRing(self.workers, frame_shape)
+        self.results = ResultSlots(self.workers, self.max_hands)
+        for index in range(self.workers):
+            jobs_reader, jobs_writer = context.Pipe(duplex=False)
+            done_reader, done_writer = context.Pipe(duplex=False)
+            process = context.Process(target=_worker_main, name=f'hand-inference-{index}', daemon=True,
+                                      args=(index, self.ring.name, self.workers, frame_shape, self.results.name,
+                                            self.max_hands, self.roi_scale, jobs_reader, done_writer))
+            process.start()
+            # Only the worker holds these ends now, so its exit shows up
+            # here as EOF on the done pipe and a broken jobs pipe
+            jobs_reader.close()
+            done_writer.close()
+            self.processes.append(process)
+            self._jobs.append(jobs_writer)
+            self._done.append(done_reader)
+            self._alive[index] = True
+        print(f"Started {self.workers} hand inference worker(s)")
+
+    @property
+    def started(self):
+        return self.ring is not None
+
+    # Number of frames handed out whose results haven't come back yet
+    @property
+    def busy(self):
+        with self._cond:
+            return sum(job is not None for job in self._busy)
+
+    # Number of workers that haven't died
+    @property
+    def alive(self):
+        return sum(self._alive)
+
+    # Worker index went away: give up its job and stop using it
+    def _lost(self, index):
+        with self._cond:
+            if not self._alive[index]:
+                return
+            self._alive[index] = False
+            self._busy[index] = None
+            self._cond.notify_all()
+        process = self.processes[index]
+        process.join(timeout=1.0)
+        exitcode = process.exitcode
+        print(f"Hand inference worker {index} died (exit code {exitcode}), {self.alive} left")
+
+    # Hand frame to the next idle worker in round-robin order. Returns False
+    # if every worker is busy (or dead).
+    def submit(self, frame, capture_time, roi):
+        with self._cond:
+            for offset in range(self.workers):
+                index = (self._next + offset) % self.workers
+                if self._alive[index] and self._busy[index] is None:
+                    break
+            else:
+                return False
+            self._seq += 1
+            seq = self._seq
+            self._busy[index] = (seq, frame, capture_time)
+            self._next = index + 1
+        self.ring.write(index, frame, seq, capture_time)
+        try:
+            self._jobs[index].send((seq, roi))
+        except (BrokenPipeError, OSError):
+            self._lost(index)
+            return False
+        self.submitted += 1
+        return True
+
+    # Block until some worker is idle, or none is left (or the timeout expires)
+    def wait_idle(self, timeout=None):
+        def idle():
+            return not self.alive or any(alive and busy is None for alive, busy in zip(self._alive, self._busy))
+        with self._cond:
+            return self._cond.wait_for(idle, timeout)
+
+    # Wait up to timeout for results and return them as a list of
+    # (seq, capture_time, frame, RemoteHands)
+    def collect(self, timeout=None):
+        finished = []
+        live = [connection for connection, alive in zip(self._done, self._alive) if alive]
+        if not live:
+            time.sleep(timeout or 0)  # Not started yet, or no workers left
+            return finished
+        for connection in wait(live, timeout):
+            index = self._done.index(connection)
+            try:
+                connection.recv_bytes()
+            except EOFError:
+                self._lost(index)
+                continue
+            record = self.results.read(index)
+            with self._cond:
+                seq, frame, capture_time = self._busy[index]
+                self._busy[index] = None
+                self._cond.notify_all()
+            if record is None or record['frame'] != seq:
+                self.skipped += 1
+                continue
+            count = int(record['count'])
+            hands = RemoteHands(record['landmarks'][:count], record['handedness'][:count],
+                                float(record['inference_time']))
+            finished.append((seq, capture_time, frame, hands))
+            self.completed += 1
+        return finished
+
+    def close(self):
+        for jobs in self._jobs:
+            try:
+                jobs.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.results.close()
+            self.results.unlink()
+            self.ring = self.results = None
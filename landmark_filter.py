@@ -0,0 +1,79 @@
+import math
+import numpy as np
+import settings
+
+# One-Euro filter over every hand landmark at once.
+#
+# The cutoff frequency of a first-order low-pass filter adapts to the speed of
+# each point: a resting fingertip is smoothed heavily (min_cutoff), a fast
+# moving one hardly at all (min_cutoff + beta * speed), so jitter goes away
+# without adding lag to deliberate movements. See Casiez et al., "1€ Filter:
+# A Simple Speed-based Low-pass Filter for Noisy Input in Interactive
+# Systems" (CHI 2012).
+#
+# filter() takes a (hands, 21, 2) array of screen points and smooths it in
+# place with a handful of NumPy operations, whatever the number of hands.
+# Optionally the filtered points are extrapolated by predict seconds along the
+# filtered velocity to make up for the camera-to-screen latency.
+class OneEuroFilter:
+    def __init__(self, min_cutoff=settings.LANDMARK_MIN_CUTOFF, beta=settings.LANDMARK_BETA,
+                 d_cutoff=settings.LANDMARK_D_CUTOFF, predict=settings.LANDMARK_PREDICT_MS / 1000.0,
+                 reset_after=0.5, reset_distance=150.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.predict = predict
+        self.reset_after = reset_after  # Start over after a gap this long (seconds)
+        self.reset_distance = reset_distance  # A wrist jumping this far (pixels) is a different hand
+        self.reset()
+
+    def reset(self):
+        self._points = None  # Filtered positions
+        self._velocity = None  # Filtered velocities, pixels per second
+        self._timestamp = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    # Smooth points, taken at timestamp (seconds), in place and return them
+    def filter(self, points, timestamp):
+        previous = self._points
+        if (previous is None or previous.shape != points.shape
+                or timestamp - self._timestamp > self.reset_after):
+            # Nothing to smooth against yet (or the hands changed): take the
+            # measurement as is
+            self._points = points.copy()
+            self._velocity = np.zeros_like(points)
+            self._timestamp = timestamp
+            return points
+        dt = timestamp - self._timestamp
+        if dt <= 0:
+            # Same frame again; hand out the previous result
+            points[:] = self._output()
+            return points
+        self._timestamp = timestamp
+
+        # MediaPipe may hand the hands over in a different order; hands whose
+        # wrist moved implausibly far restart from their new position
+        jumped = np.hypot(*(points[:, 0] - previous[:, 0]).T) > self.reset_distance
+        if jumped.any():
+            previous[jumped] = points[jumped]
+            self._velocity[jumped] = 0
+
+        # Velocity, low-passed at a fixed cutoff
+        velocity = (points - previous) / dt
+        self._velocity += self._alpha(self.d_cutoff, dt) * (velocity - self._velocity)
+
+        # Position, low-passed at a cutoff that rises with each point's speed
+        speed = np.hypot(self._velocity[..., 0], self._velocity[..., 1])[..., None]
+        previous += self._alpha(self.min_cutoff + self.beta * speed, dt) * (points - previous)
+
+        points[:] = self._output()
+        return points
+
+    def _output(self):
+        if self.predict:
+            return self._points + self._velocity * self.predict
+        return self._points
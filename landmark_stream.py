@@ -0,0 +1,143 @@
+import os
+import numpy as np
+
+# Compact, append-only recording of hand landmarks.
+#
+# The file is a 32-byte header followed by fixed-size records, so it can be
+# memory-mapped as one structured NumPy array and replayed without parsing or
+# copying. Each record holds the capture timestamp, the number of hands, their
+# handedness and a (max_hands, 21, 3) float32 block of landmarks normalized to
+# the full camera frame. Unused hand slots are zero.
+
+MAGIC = b'HGLM'
+VERSION = 1
+HEADER_SIZE = 32
+NUM_LANDMARKS = 21
+
+# Handedness codes stored per hand slot
+HAND_UNKNOWN = 0
+HAND_LEFT = 1
+HAND_RIGHT = 2
+HANDEDNESS_CODES = {'Left': HAND_LEFT, 'Right': HAND_RIGHT}
+
+HEADER_DTYPE = np.dtype({
+    'names': ['magic', 'version', 'max_hands', 'frame_width', 'frame_height'],
+    'formats': ['S4', '<u2', '<u2', '<u4', '<u4'],
+    'offsets': [0, 4, 6, 8, 12],
+    'itemsize': HEADER_SIZE,
+})
+
+def record_dtype(max_hands):
+    return np.dtype({
+        'names': ['timestamp', 'count', 'handedness', 'landmarks'],
+        'formats': ['<f8', 'u1', ('u1', (max_hands,)), ('<f4', (max_hands, NUM_LANDMARKS, 3))],
+        'offsets': [0, 8, 9, 16],
+        'itemsize': 16 + max_hands * NUM_LANDMARKS * 3 * 4,
+    })
+
+class LandmarkStreamWriter:
+    def __init__(self, path, frame_size, max_hands=2, flush_every=30):
+        self.path = path
+        self.max_hands = max_hands
+        self.flush_every = flush_every
+        self.count = 0
+
+        # Append to an existing stream only if it was written with the same layout
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['max_hands'] = max_hands
+        header['frame_width'], header['frame_height'] = frame_size
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            existing = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+            if existing.tobytes() != header.tobytes():
+                raise ValueError(f"{path} was recorded with a different landmark layout")
+            # Drop a partial record left by an interrupted session, or every
+            # record appended after it would be misaligned
+            self._file = open(path, 'r+b')
+            itemsize = record_dtype(max_hands).itemsize
+            size = os.path.getsize(path)
+            complete = HEADER_SIZE + (size - HEADER_SIZE) // itemsize * itemsize
+            if complete != size:
+                print(f"Dropping {size - complete} bytes of an incomplete record from {path}")
+                self._file.truncate(complete)
+            self._file.seek(complete)
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(path, 'wb')
+            self._file.write(header.tobytes())
+
+        self._record = np.zeros(1, dtype=record_dtype(max_hands))
+
+    # Append one frame. landmarks is a (hands, 21, 3) array normalized to the
+    # full frame; handedness an optional sequence of HAND_* codes.
+    def write(self, timestamp, landmarks, handedness=None):
+        record = self._record[0]
+        count = min(len(landmarks), self.max_hands)
+        record['timestamp'] = timestamp
+        record['count'] = count
+        record['handedness'] = HAND_UNKNOWN
+        record['landmarks'] = 0
+        if count:
+            record['landmarks'][:count] = landmarks[:count]
+            if handedness is not None:
+                record['handedness'][:count] = handedness[:count]
+        self._file.write(self._record.tobytes())
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class LandmarkStreamReader:
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header['magic'][0] != MAGIC:
+            raise ValueError(f"{path} is not a landmark stream")
+        if header['version'][0] != VERSION:
+            raise ValueError(f"Unsupported landmark stream version {header['version'][0]}")
+        self.max_hands = int(header['max_hands'][0])
+        self.frame_size = (int(header['frame_width'][0]), int(header['frame_height'][0]))
+
+        # Map every complete record; a trailing partial record from an
+        # interrupted session is ignored
+        dtype = record_dtype(self.max_hands)
+        num_records = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+        if num_records > 0:
+            self.records = np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(num_records,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    # Column views over the whole session, e.g. for vectorized analysis
+    @property
+    def timestamps(self):
+        return self.records['timestamp']
+
+    @property
+    def landmarks(self):
+        return self.records['landmarks']
+
+    # Average frame rate of the recording
+    @property
+    def fps(self):
+        if len(self.records) < 2:
+            return 30
+        duration = self.records['timestamp'][-1] - self.records['timestamp'][0]
+        return (len(self.records) - 1) / duration if duration > 0 else 30
+
+    # (timestamp, landmarks, handedness) for record i; the arrays are views into the map
+    def __getitem__(self, i):
+        record = self.records[i]
+        count = record['count']
+        return float(record['timestamp']), record['landmarks'][:count], record['handedness'][:count]
+
+    def __iter__(self):
+        for i in range(len(self.records)):
+            yield self[i]
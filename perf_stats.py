@@ -0,0 +1,177 @@
+import atexit
+import csv
+import json
+import threading
+import time
+from collections import deque
+import numpy as np
+import settings
+
+# Lightweight per-stage timing for the camera pipeline and the app loops.
+#
+# Each loop owns a FrameTimer and calls start(), lap('stage') after every step
+# and stop() at the end of the frame. Durations land in a named PerfStats,
+# which keeps a rolling window for percentiles/FPS and, when a dump path is
+# configured, the full per-frame history written out on exit. With
+# HOLO_PERF=0 every call returns immediately.
+
+ENABLED = settings.PERF_ENABLED
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+class PerfStats:
+    def __init__(self, name, window=settings.PERF_WINDOW, keep_history=bool(settings.PERF_DUMP)):
+        self.name = name
+        self.window = window
+        self.keep_history = keep_history
+        self.samples = {}  # stage -> deque of seconds
+        self.frame_times = deque(maxlen=window)
+        self.history = []  # (timestamp, {stage: seconds}) per frame
+        self.frame_count = 0
+
+    # Record a single measurement for stage
+    def add(self, stage, seconds):
+        if not ENABLED:
+            return
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples.setdefault(stage, deque(maxlen=self.window))
+        samples.append(seconds)
+
+    # Record a whole frame's stage durations at once
+    def add_frame(self, timestamp, laps):
+        if not ENABLED:
+            return
+        for stage, seconds in laps.items():
+            self.add(stage, seconds)
+        self.frame_times.append(timestamp)
+        self.frame_count += 1
+        if self.keep_history:
+            self.history.append((timestamp, dict(laps)))
+
+    # Frames per second over the rolling window
+    def fps(self):
+        if len(self.frame_times) < 2:
+            return 0.0
+        elapsed = self.frame_times[-1] - self.frame_times[0]
+        return (len(self.frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    # {stage: {'p50': ms, 'p90': ms, 'p99': ms, 'mean': ms}} over the rolling window
+    def summary(self):
+        result = {}
+        for stage, samples in list(self.samples.items()):
+            if not samples:
+                continue
+            values = np.fromiter(samples, dtype=np.float64) * 1000.0
+            p50, p90, p99 = np.percentile(values, (50, 90, 99))
+            result[stage] = {'p50': p50, 'p90': p90, 'p99': p99, 'mean': values.mean(), 'count': len(values)}
+        return result
+
+# Lap timer for one loop; one instance per thread
+class FrameTimer:
+    def __init__(self, stats):
+        self.stats = stats
+        self.laps = {}
+        self._frame_start = 0.0
+        self._last = 0.0
+
+    def start(self):
+        if not ENABLED:
+            return
+        self._frame_start = self._last = time.perf_counter()
+        self.laps = {}
+
+    # Attribute the time since the previous lap (or start) to stage
+    def lap(self, stage):
+        if not ENABLED:
+            return
+        now = time.perf_counter()
+        self.laps[stage] = self.laps.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def stop(self):
+        if not ENABLED:
+            return
+        now = time.perf_counter()
+        self.laps['frame'] = now - self._frame_start
+        self.stats.add_frame(time.monotonic(), self.laps)
+
+def get_stats(name):
+    with _registry_lock:
+        stats = _registry.get(name)
+        if stats is None:
+            stats = _registry[name] = PerfStats(name)
+        return stats
+
+def frame_timer(name):
+    return FrameTimer(get_stats(name))
+
+def all_stats():
+    with _registry_lock:
+        return dict(_registry)
+
+# Forget everything recorded so far, e.g. between benchmark runs. Stats that
+# were already handed out keep working but are no longer reported.
+def reset():
+    with _registry_lock:
+        _registry.clear()
+
+# Write everything recorded so far: .csv gets one row per frame and stage,
+# anything else a JSON document with the rolling summaries and FPS
+def dump(path):
+    stats = all_stats()
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['source', 'frame', 'timestamp', 'stage', 'ms'])
+            for name, s in stats.items():
+                for index, (timestamp, laps) in enumerate(s.history):
+                    for stage, seconds in laps.items():
+                        writer.writerow([name, index, f'{timestamp:.6f}', stage, f'{seconds * 1000:.3f}'])
+    else:
+        report = {name: {'fps': s.fps(), 'frames': s.frame_count, 'stages': s.summary()}
+                  for name, s in stats.items()}
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"Wrote performance stats to {path}")
+
+if ENABLED and settings.PERF_DUMP:
+    atexit.register(dump, settings.PERF_DUMP)
+
+# On-screen overlay with FPS and p50/p99 per stage. The text is only
+# re-rendered a couple of times per second so the HUD itself stays cheap.
+# Can be registered directly as a RenderLayer overlay.
+_hud_lines = []
+_hud_updated = 0.0
+
+def draw_hud(screen, names=None, position=(10, 10)):
+    global _hud_lines, _hud_updated
+    if not (ENABLED and settings.PERF_HUD):
+        return
+    import text_cache
+
+    now = time.monotonic()
+    if now - _hud_updated > 0.5:
+        font = text_cache.get_font(20)
+        lines = []
+        for name, s in all_stats().items():
+            if names and name not in names:
+                continue
+            lines.append(f'{name}: {s.fps():.1f} fps')
+            for stage, values in s.summary().items():
+                lines.append(f'  {stage:<10} p50 {values["p50"]:6.2f} ms  p99 {values["p99"]:6.2f} ms')
+        text = text_cache.stats()
+        lines.append(f'text cache: {text["entries"]} surfaces, {text["bytes"] / 1024:.0f} KB, '
+                     f'{text["hit_rate"] * 100:.1f}% hits')
+        _hud_lines = [font.render(line, True, (255, 255, 0), (0, 0, 0)) for line in lines]
+        _hud_updated = now
+
+    # Return the area covered so dirty-rect renderers can present and restore it
+    x, y = position
+    covered = None
+    for surface in _hud_lines:
+        rect = screen.blit(surface, (x, y))
+        covered = rect if covered is None else covered.union(rect)
+        y += surface.get_height()
+    return covered
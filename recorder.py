@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import cv2
+
+STREAMS = ('raw', 'warped', 'annotated')
+
+# Records camera frames to disk on a background encoder thread. Frames are
+# queued in a bounded ring buffer; when the encoder falls behind new frames are
+# dropped (and counted) instead of stalling the capture loop. Output is split
+# into segments once a file reaches the size or duration limit.
+#
+# Frames carry the time they were taken. Files are written at a constant fps,
+# so when frames arrive less often than that (inference throttled while the UI
+# is idle, say) each one is repeated to fill its share of the timeline, and
+# recordings play back in real time.
+class VideoRecorder:
+    def __init__(self, stream='raw', directory='recordings', fps=30, fourcc='XVID',
+                 buffer_size=64, max_segment_bytes=256 * 1024 * 1024, max_segment_seconds=300):
+        if stream not in STREAMS:
+            raise ValueError(f"Unknown recording stream '{stream}', expected one of {STREAMS}")
+        self.stream = stream
+        self.directory = directory
+        self.fps = fps
+        self.fourcc = fourcc
+        self.buffer_size = buffer_size
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+
+        self.written = 0
+        self.dropped = 0
+        self.repeated = 0
+        self.segments = []
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._writer = None
+        self._segment_path = None
+        self._segment_start = 0
+        self._segment_frames = 0
+        self._segment_timestamp = None  # Timestamp of the segment's first frame
+        self._last_frame = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._encode_loop, name='video-recorder', daemon=True)
+        self._thread.start()
+
+    # Queue a frame taken at timestamp (time.monotonic(), now by default) for
+    # encoding. Never blocks; returns False if the frame was dropped.
+    def write(self, frame, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._cond:
+            if not self._running or len(self._buffer) >= self.buffer_size:
+                self.dropped += 1
+                return False
+            self._buffer.append((timestamp, frame))
+            self._cond.notify()
+        return True
+
+    def _encode_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer or not self._running)
+                if not self._buffer:
+                    break
+                timestamp, frame = self._buffer.popleft()
+            try:
+                self._encode(timestamp, frame)
+            except Exception as e:
+                self.dropped += 1
+                self._stop(f"Recording failed: {e}")
+
+        self._close_segment()
+
+    def _encode(self, timestamp, frame):
+        if self._writer is None or self._segment_full():
+            self._open_segment(frame, timestamp)
+        else:
+            # Hold the previous frame until this one is due on the fixed-rate
+            # timeline. Gaps over a second (a stalled camera) are shortened
+            # to one; frames arriving early are written all the same.
+            gap = int(round((timestamp - self._segment_timestamp) * self.fps)) - self._segment_frames
+            limit = max(int(self.fps), 1)
+            if gap > limit:
+                self._segment_timestamp += (gap - limit) / self.fps
+                gap = limit
+            for _ in range(gap):
+                self._writer.write(self._last_frame)
+            if gap > 0:
+                self._segment_frames += gap
+                self.repeated += gap
+        self._writer.write(frame)
+        self._last_frame = frame
+        self._segment_frames += 1
+        self.written += 1
+
+    def _segment_full(self):
+        if time.monotonic() - self._segment_start >= self.max_segment_seconds:
+            return True
+        # Checking the file size costs a syscall, so only do it about once a second
+        if self._segment_frames % max(int(self.fps), 1) == 0 and os.path.exists(self._segment_path):
+            return os.path.getsize(self._segment_path) >= self.max_segment_bytes
+        return False
+
+    def _open_segment(self, frame, timestamp):
+        self._close_segment()
+        name = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.directory, f'{self.stream}_{name}_{len(self.segments):03d}.avi')
+        height, width = frame.shape[:2]
+        writer = None
+        # Fall back to Motion JPEG, which every OpenCV build can write
+        for fourcc in dict.fromkeys((self.fourcc, 'MJPG')):
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), self.fps, (width, height))
+            if writer.isOpened():
+                break
+            print(f"Could not open {path} with codec {fourcc}")
+            writer.release()
+            writer = None
+        if writer is None:
+            raise IOError(f"no usable video codec for {path}")
+        self.fourcc = fourcc
+        self._writer = writer
+        self._segment_path = path
+        self._segment_start = time.monotonic()
+        self._segment_timestamp = timestamp
+        self._segment_frames = 0
+        self.segments.append(path)
+
+    # Give up recording: everything queued or written from now on is dropped
+    def _stop(self, message):
+        print(message)
+        self._close_segment()
+        with self._cond:
+            self._running = False
+            self.dropped += len(self._buffer)
+            self._buffer.clear()
+
+    def _close_segment(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    # Stop accepting frames, flush whatever is still buffered and close the file
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        print(f"Recorded {self.written} frames to {len(self.segments)} segment(s), dropped {self.dropped}, "
+              f"repeated {self.repeated} to keep real time")
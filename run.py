@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 import mediapipe as mp
+import settings
+from frame_sources import open_image_source
 
 # Initialize mediapipe
 mp_hands = mp.solutions.hands
@@ -11,7 +13,7 @@ hands = mp_hands.Hands(static_image_mode=False,
 
 mp_drawing = mp.solutions.drawing_utils
 
-cap = cv2.VideoCapture(1)
+cap = open_image_source(settings.CAMERA_SOURCE, realtime=settings.CAMERA_REALTIME)
 
 # Read in M matrices
 M = np.load("M.npy")
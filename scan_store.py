@@ -0,0 +1,152 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import cv2
+import numpy as np
+import settings
+
+INDEX_FILE = 'index.jsonl'
+
+# Stores depth scans with their metric data.
+#
+# Each scan is written as
+#   <id>.npz          raw depth as float16 (compressed)
+#   <id>.json         sidecar: timestamp, min/max depth, shape, homography, files
+#   <id>_preview.png  the 8-bit equalized map app_2 displays
+#   <id>_frame.jpg    the camera frame the scan was taken from (optional)
+# and gets one line in index.jsonl with the sidecar's contents, so listing
+# scans reads a single small file. Encoding and writing happen on a
+# background writer thread; save() only queues the scan. Unlike camera
+# frames, scans are never dropped.
+class ScanStore:
+    def __init__(self, directory=settings.SCAN_DIR, save_frame=settings.SCAN_SAVE_FRAME):
+        self.directory = directory
+        self.save_frame = save_frame
+        self.written = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._ids = set()  # Handed out by this store, written or still queued
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name='scan-store', daemon=True)
+        self._thread.start()
+
+    def _new_id(self, timestamp):
+        base = 'scan_' + datetime.fromtimestamp(timestamp).strftime('%Y%m%d_%H%M%S_%f')[:-3]
+        # Scans within the same millisecond (or clashing with one from an
+        # earlier session) get a counter suffix so no files are overwritten
+        scan_id = base
+        suffix = 0
+        while scan_id in self._ids or os.path.exists(os.path.join(self.directory, scan_id + '.json')):
+            suffix += 1
+            scan_id = f'{base}_{suffix}'
+        self._ids.add(scan_id)
+        return scan_id
+
+    # Queue a scan for writing and return its id. depth is the model's raw
+    # float output, preview the 8-bit map, frame the source camera frame (BGR)
+    # and homography the camera-to-screen matrix it was warped with.
+    def save(self, depth, preview=None, frame=None, homography=None, timestamp=None, extra=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._cond:
+            scan_id = self._new_id(timestamp)
+            self._queue.append((scan_id, timestamp, depth, preview, frame, homography, extra))
+            self._cond.notify()
+        return scan_id
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    break
+                scan = self._queue[0]
+            try:
+                self._write(*scan)
+            except Exception as e:
+                print(f"Could not save scan {scan[0]}: {e}")
+            with self._cond:
+                self._queue.popleft()
+                self._cond.notify_all()
+
+    def _write(self, scan_id, timestamp, depth, preview, frame, homography, extra):
+        base = os.path.join(self.directory, scan_id)
+        depth = np.asarray(depth)
+        files = {'depth': scan_id + '.npz'}
+        np.savez_compressed(base + '.npz', depth=depth.astype(np.float16))
+        if preview is not None:
+            files['preview'] = scan_id + '_preview.png'
+            cv2.imwrite(base + '_preview.png', preview)
+        if frame is not None and self.save_frame:
+            files['frame'] = scan_id + '_frame.jpg'
+            cv2.imwrite(base + '_frame.jpg', frame)
+
+        metadata = {
+            'id': scan_id,
+            'timestamp': timestamp,
+            'time': datetime.fromtimestamp(timestamp).isoformat(timespec='milliseconds'),
+            'min_depth': float(depth.min()),
+            'max_depth': float(depth.max()),
+            'shape': list(depth.shape),
+            'dtype': 'float16',
+            'homography': np.asarray(homography).tolist() if homography is not None else None,
+            'files': files,
+        }
+        if extra:
+            metadata.update(extra)
+        with open(base + '.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
+        # The index line goes last, so everything it lists is complete on disk
+        with open(os.path.join(self.directory, INDEX_FILE), 'a') as f:
+            f.write(json.dumps(metadata) + '\n')
+        self.written += 1
+        print(f"Saved scan {scan_id} (depth {metadata['min_depth']:.3f}-{metadata['max_depth']:.3f})")
+
+    # Metadata of every scan in the store, oldest first
+    def list(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return []
+        scans = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    scans.append(json.loads(line))
+        return scans
+
+    # (depth as float32, metadata) for a scan id
+    def load(self, scan_id):
+        base = os.path.join(self.directory, scan_id)
+        with open(base + '.json') as f:
+            metadata = json.load(f)
+        with np.load(base + '.npz') as data:
+            depth = data['depth'].astype(np.float32)
+        return depth, metadata
+
+    # Wait until everything queued so far is on disk
+    def flush(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue, timeout)
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join()
+
+_store = None
+_store_lock = threading.Lock()
+
+# The process-wide store for settings.SCAN_DIR
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScanStore()
+            atexit.register(_store.close)  # Finish writing queued scans before exiting
+        return _store
@@ -0,0 +1,157 @@
+import os
+
+# Runtime configuration shared by the home screen, the apps and CameraManager.
+# Every value can be overridden through an environment variable so a table can
+# be tuned without editing code.
+
+def env_flag(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+def env_str(name, default):
+    return os.environ.get(name, default)
+
+# Camera pipeline
+# Frame source: camera index, video file, image directory/glob (see frame_sources)
+CAMERA_SOURCE = env_str('HOLO_CAMERA_SOURCE', '1')
+# Pace file and replay sources at their recorded rate instead of as fast as possible
+CAMERA_REALTIME = env_flag('HOLO_CAMERA_REALTIME', True)
+CAMERA_LOOP = env_flag('HOLO_CAMERA_LOOP', False)
+# Run capture and hand inference on their own threads so update() never waits on the camera
+CAMERA_THREADED = env_flag('HOLO_CAMERA_THREADED', True)
+# Run hand inference only on the part of the camera frame that maps onto the
+# projected surface (from M.npy), padded by ROI_MARGIN and optionally downscaled
+CAMERA_ROI = env_flag('HOLO_CAMERA_ROI', True)
+CAMERA_ROI_MARGIN = env_float('HOLO_CAMERA_ROI_MARGIN', 0.1)
+CAMERA_ROI_SCALE = env_float('HOLO_CAMERA_ROI_SCALE', 1.0)
+# Show the annotated OpenCV "Camera View" window alongside the projected UI
+CAMERA_PREVIEW = env_flag('HOLO_CAMERA_PREVIEW', False)
+
+# Session recording
+# Stream to record: '' (off), 'raw', 'warped' or 'annotated'
+RECORD_STREAM = env_str('HOLO_RECORD', '')
+RECORD_DIR = env_str('HOLO_RECORD_DIR', 'recordings')
+RECORD_BUFFER_FRAMES = env_int('HOLO_RECORD_BUFFER', 64)
+RECORD_SEGMENT_MB = env_int('HOLO_RECORD_SEGMENT_MB', 256)
+RECORD_SEGMENT_SECONDS = env_int('HOLO_RECORD_SEGMENT_SECONDS', 300)
+# Landmark stream (.lmk) to append every frame's hand landmarks to; '' disables it.
+# Replay it by pointing HOLO_CAMERA_SOURCE at the file.
+LANDMARK_LOG = env_str('HOLO_LANDMARK_LOG', '')
+
+# Performance instrumentation (see perf_stats)
+PERF_ENABLED = env_flag('HOLO_PERF', True)
+# Draw FPS and per-stage timings on top of the UI
+PERF_HUD = env_flag('HOLO_PERF_HUD', False)
+# Dump all timings on exit: .csv for per-frame rows, .json for summaries
+PERF_DUMP = env_str('HOLO_PERF_DUMP', '')
+PERF_WINDOW = env_int('HOLO_PERF_WINDOW', 300)
+
+# Frame pacing (see frame_scheduler)
+TARGET_FPS = env_int('HOLO_TARGET_FPS', 60)
+# Frame rate once no hand has been seen for IDLE_AFTER seconds
+IDLE_FPS = env_int('HOLO_IDLE_FPS', 10)
+IDLE_AFTER = env_float('HOLO_IDLE_AFTER', 3.0)
+# Let display.flip() wait for vertical sync instead of sleeping to the frame budget
+VSYNC = env_flag('HOLO_VSYNC', False)
+
+# Text rendering (see text_cache)
+# Rendered text surfaces are kept in an LRU bounded by entry count and memory
+TEXT_CACHE_ENTRIES = env_int('HOLO_TEXT_CACHE_ENTRIES', 512)
+TEXT_CACHE_MB = env_float('HOLO_TEXT_CACHE_MB', 8)
+
+# Sound effects (see sound_engine)
+SOUND_ENABLED = env_flag('HOLO_SOUND', True)
+SOUND_CHANNELS = env_int('HOLO_SOUND_CHANNELS', 8)
+# The same effect is not restarted more often than this (seconds)
+SOUND_MIN_INTERVAL = env_float('HOLO_SOUND_MIN_INTERVAL', 0.15)
+
+# App loading (see app_registry)
+# Import the app the user is most likely to open next in the background while
+# the home screen shows the app grid
+APP_WARMUP = env_flag('HOLO_APP_WARMUP', True)
+# Also warm up apps with heavy dependencies (torch, model weights); this can
+# stall the home screen while they load
+APP_WARMUP_HEAVY = env_flag('HOLO_APP_WARMUP_HEAVY', False)
+
+# Depth estimation model for app_2 (see depth_model)
+DEPTH_CHECKPOINT = env_str('HOLO_DEPTH_CHECKPOINT', 'vinvino02/glpn-nyu')
+# Directory the model weights are cached in; '' uses the Hugging Face default cache
+DEPTH_CACHE_DIR = env_str('HOLO_DEPTH_CACHE_DIR', '')
+# Load only from the local cache and never touch the network. Set to 0 once to
+# download the weights.
+DEPTH_OFFLINE = env_flag('HOLO_DEPTH_OFFLINE', True)
+# Scans waiting for the depth model at most; further presses are ignored
+DEPTH_MAX_PENDING = env_int('HOLO_DEPTH_MAX_PENDING', 3)
+# Inference backend: 'torch' (eager), 'torchscript' or 'onnx' (ONNX Runtime).
+# TorchScript and ONNX models are exported once per input size into DEPTH_EXPORT_DIR.
+DEPTH_BACKEND = env_str('HOLO_DEPTH_BACKEND', 'torch')
+DEPTH_EXPORT_DIR = env_str('HOLO_DEPTH_EXPORT_DIR', 'models')
+# Resolution the model runs at, e.g. '512x384'; '' runs at the warped frame's size.
+# The depth map is upsampled back to the frame size either way.
+DEPTH_INPUT_SIZE = env_str('HOLO_DEPTH_INPUT_SIZE', '')
+# Intra-op threads for inference; 0 keeps the library default
+DEPTH_THREADS = env_int('HOLO_DEPTH_THREADS', 0)
+# int8 dynamic quantization of the model's linear layers
+DEPTH_QUANTIZE = env_flag('HOLO_DEPTH_QUANTIZE', False)
+# Live depth mode in app_2: model runs per second at most, the resolution it
+# runs at, how much the warped frame must change (mean absolute difference,
+# 0-1) before the model runs again, and the weight of each new result when
+# blending it into the overlay
+DEPTH_LIVE_FPS = env_float('HOLO_DEPTH_LIVE_FPS', 2.0)
+DEPTH_LIVE_SIZE = env_str('HOLO_DEPTH_LIVE_SIZE', '320x240')
+DEPTH_LIVE_CHANGE = env_float('HOLO_DEPTH_LIVE_CHANGE', 0.01)
+DEPTH_LIVE_BLEND = env_float('HOLO_DEPTH_LIVE_BLEND', 0.6)
+
+# Depth scans (see scan_store)
+SCAN_DIR = env_str('HOLO_SCAN_DIR', 'scans')
+# Keep the camera frame each scan was taken from next to it
+SCAN_SAVE_FRAME = env_flag('HOLO_SCAN_SAVE_FRAME', True)
+
+# Landmark smoothing (see landmark_filter)
+# One-Euro filter on the transformed screen landmarks: MIN_CUTOFF (Hz) sets how
+# strongly a resting finger is smoothed, BETA how quickly smoothing backs off as
+# it moves
+LANDMARK_FILTER = env_flag('HOLO_LANDMARK_FILTER', True)
+LANDMARK_MIN_CUTOFF = env_float('HOLO_LANDMARK_MIN_CUTOFF', 1.0)
+LANDMARK_BETA = env_float('HOLO_LANDMARK_BETA', 0.01)
+LANDMARK_D_CUTOFF = env_float('HOLO_LANDMARK_D_CUTOFF', 1.0)
+# Extrapolate landmarks this far ahead along their velocity to hide pipeline
+# latency (0 disables prediction)
+LANDMARK_PREDICT_MS = env_float('HOLO_LANDMARK_PREDICT_MS', 0.0)
+
+# Gestures (see gestures)
+# Minimum time between two taps (a finger sliding off a button), in seconds
+BUTTON_COOLDOWN = env_float('HOLO_BUTTON_COOLDOWN', 0.25)
+# A pinch starts when thumb and index tip come closer than PINCH_DISTANCE
+# pixels and ends once they are farther apart than RELEASE_DISTANCE, or
+# after PINCH_HOLD seconds in between
+GESTURE_PINCH_DISTANCE = env_float('HOLO_GESTURE_PINCH_DISTANCE', 50)
+GESTURE_RELEASE_DISTANCE = env_float('HOLO_GESTURE_RELEASE_DISTANCE', 60)
+GESTURE_PINCH_HOLD = env_float('HOLO_GESTURE_PINCH_HOLD', 0.2)
+# Resting on a target this long (seconds) produces a dwell event
+GESTURE_DWELL_TIME = env_float('HOLO_GESTURE_DWELL_TIME', 0.6)
+
+# Detect-then-track (see hand_tracker)
+# Run MediaPipe only every DETECT_INTERVAL frames and follow the landmarks with
+# optical flow in between; 1 runs MediaPipe on every frame
+TRACK_DETECT_INTERVAL = env_int('HOLO_TRACK_DETECT_INTERVAL', 1)
+# Detect again as soon as fewer than this fraction of a hand's landmarks track
+# cleanly, i.e. within MAX_ERROR pixels of forward-backward error
+TRACK_MIN_QUALITY = env_float('HOLO_TRACK_MIN_QUALITY', 0.7)
+TRACK_MAX_ERROR = env_float('HOLO_TRACK_MAX_ERROR', 2.0)
+
+# Hand inference worker processes (see inference_worker)
+# Run MediaPipe in this many separate processes, fed frames round-robin through
+# shared memory; 0 runs it on the pipeline's inference thread. Needs
+# CAMERA_THREADED, and bypasses detect-then-track.
+INFERENCE_WORKERS = env_int('HOLO_INFERENCE_WORKERS', 0)
@@ -0,0 +1,112 @@
+import os
+import queue
+import threading
+import time
+from pygame import mixer
+import assets
+import settings
+
+# Sound effects for the UI.
+#
+# play() only queues a request and returns; a background thread looks up the
+# decoded Sound (see assets) and starts it on a free channel from a reserved
+# pool, so effects overlap instead of cutting each other off. When every
+# channel is busy, the oldest sound with a lower or equal priority is cut
+# short; if none qualifies the new one is dropped. Requests for an effect
+# that started less than min_interval ago are ignored, which keeps triggers
+# that fire every frame from retriggering.
+
+LOW = 0  # Clicks and other frequent feedback
+NORMAL = 1
+HIGH = 2  # Navigation and confirmations
+
+class SoundEngine:
+    def __init__(self, channels=settings.SOUND_CHANNELS, min_interval=settings.SOUND_MIN_INTERVAL,
+                 enabled=settings.SOUND_ENABLED):
+        self.num_channels = channels
+        self.min_interval = min_interval
+        self.enabled = enabled
+        self.played = 0
+        self.rate_limited = 0
+        self.dropped = 0
+        self.stolen = 0
+        self._requests = queue.Queue()
+        self._last_played = {}  # path -> time the effect was last requested
+        self._channels = []
+        self._playing = []  # (priority, start time) per channel
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def play(self, path, priority=NORMAL, min_interval=None):
+        if not self.enabled:
+            return
+        path = os.path.normpath(path)
+        now = time.monotonic()
+        interval = self.min_interval if min_interval is None else min_interval
+        with self._lock:
+            if now - self._last_played.get(path, -interval) < interval:
+                self.rate_limited += 1
+                return
+            self._last_played[path] = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._requests.put((path, priority))
+
+    def _open_channels(self):
+        if not mixer.get_init():
+            mixer.init()
+        if mixer.get_num_channels() < self.num_channels:
+            mixer.set_num_channels(self.num_channels)
+        # Keep the pool to ourselves so Sound.play() elsewhere can't take it over
+        mixer.set_reserved(self.num_channels)
+        self._channels = [mixer.Channel(i) for i in range(self.num_channels)]
+        self._playing = [(LOW, 0.0)] * self.num_channels
+
+    def _pick_channel(self, priority):
+        for index, channel in enumerate(self._channels):
+            if not channel.get_busy():
+                return index
+        # All busy: cut off the oldest sound that matters no more than this one
+        candidates = [(start, index) for index, (playing_priority, start) in enumerate(self._playing)
+                      if playing_priority <= priority]
+        if not candidates:
+            return None
+        self.stolen += 1
+        return min(candidates)[1]
+
+    def _run(self):
+        self._open_channels()
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            path, priority = request
+            sound = assets.sound(path)
+            if sound is None:
+                continue
+            index = self._pick_channel(priority)
+            if index is None:
+                self.dropped += 1
+                continue
+            self._channels[index].play(sound)
+            self._playing[index] = (priority, time.monotonic())
+            self.played += 1
+
+    def stop(self):
+        if self._thread is not None:
+            self._requests.put(None)
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def stats(self):
+        return {'played': self.played, 'rate_limited': self.rate_limited,
+                'dropped': self.dropped, 'stolen': self.stolen}
+
+_engine = SoundEngine()
+
+def play(path, priority=NORMAL, min_interval=None):
+    _engine.play(path, priority, min_interval)
+
+def stats():
+    return _engine.stats()
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+import pygame
+import settings
+
+# Shared fonts and rendered text.
+#
+# Loading a font from disk and rasterizing a string are both expensive enough
+# to show up in every loop's profile, and the UI draws the same handful of
+# labels over and over. get_font() hands out one Font per (name, size) for the
+# whole process, and render() keeps recently rendered strings in an LRU
+# bounded by entry count and memory. Cached surfaces are shared: blit them,
+# never draw onto them.
+
+_fonts = {}
+_lock = threading.Lock()
+
+def get_font(size, name=None):
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = _fonts.setdefault(key, pygame.font.Font(name, size))
+    return font
+
+class TextCache:
+    def __init__(self, max_entries=settings.TEXT_CACHE_ENTRIES, max_bytes=int(settings.TEXT_CACHE_MB * 1024 * 1024)):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (surface, bytes), least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Fonts from get_font() are unique per (name, size), so the font object
+    # stands in for both in the key
+    def render(self, text, font, color, antialias=True, background=None):
+        key = (font, text, color, antialias, background)
+        with _lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        surface = font.render(text, antialias, color, background)
+        size = surface.get_bytesize() * surface.get_width() * surface.get_height()
+        with _lock:
+            if key not in self.entries:
+                self.entries[key] = (surface, size)
+                self.bytes += size
+                while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+                    _, (_, evicted_size) = self.entries.popitem(last=False)
+                    self.bytes -= evicted_size
+                    self.evictions += 1
+        return surface
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hit_rate()}
+
+    def clear(self):
+        with _lock:
+            self.entries.clear()
+            self.bytes = 0
+
+_cache = TextCache()
+
+def render(text, font, color, antialias=True, background=None):
+    return _cache.render(text, font, color, antialias, background)
+
+def stats():
+    return _cache.stats()
@@ -0,0 +1,336 @@
+import pygame
+import text_cache
+
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+LIGHT_BLUE = (173, 216, 230)
+NAVY_BLUE = (20, 20, 40)
+
+# Retained-mode rendering with dirty rectangles.
+#
+# Screens build their UI once out of Widgets and add them to a RenderLayer.
+# Widgets mark themselves dirty when their state changes; each frame the
+# layer repaints only the regions covered by dirty widgets (both where they
+# were and where they are now) and presents them with
+# pygame.display.update(rects). A frame where nothing changed costs nothing.
+
+class Widget:
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)  # Everything the widget draws must fall inside this
+        self.visible = True
+        self.dirty = True
+        self.drawn_rect = None  # Area the widget covered the last time it was presented
+
+    # pygame's outline and line primitives don't rasterize the same when cut by
+    # a clip rect, so by default a widget is always repainted as a whole.
+    # Widgets that only blit or fill can be repainted partially.
+    clip_safe = False
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    # Set attributes and mark the widget dirty only if something actually changed
+    def set(self, **attributes):
+        for name, value in attributes.items():
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                self.dirty = True
+
+    def show(self, visible=True):
+        self.set(visible=visible)
+
+    def draw(self, surface):
+        raise NotImplementedError
+
+# Text label anchored at a point ('center' or 'topleft')
+class Label(Widget):
+    clip_safe = True
+
+    def __init__(self, pos, text, font, color=WHITE, anchor='center'):
+        self.pos = pos
+        self.text = text
+        self.font = font
+        self.color = color
+        self.anchor = anchor
+        self._surface = None
+        super().__init__(self._layout())
+
+    def _layout(self):
+        self._surface = text_cache.render(self.text, self.font, self.color)
+        return self._surface.get_rect(**{self.anchor: self.pos})
+
+    def set_text(self, text, color=None):
+        color = color or self.color
+        if text != self.text or color != self.color:
+            self.text = text
+            self.color = color
+            self.rect = self._layout()
+            self.dirty = True
+
+    def move(self, pos):
+        if pos != self.pos:
+            self.pos = pos
+            self.rect = self._surface.get_rect(**{self.anchor: pos})
+            self.dirty = True
+
+    def draw(self, surface):
+        surface.blit(self._surface, self.rect)
+
+# Several centered lines of text stacked from a top position, e.g. a text area
+class TextBlock(Widget):
+    clip_safe = True
+
+    def __init__(self, center_x, top, font, line_height, color=WHITE):
+        self.center_x = center_x
+        self.top = top
+        self.font = font
+        self.line_height = line_height
+        self.color = color
+        self.text = None
+        self._lines = []
+        super().__init__((center_x, top, 0, 0))
+        self.set_text('')
+
+    def set_text(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        self._lines = []
+        rect = pygame.Rect(self.center_x, self.top, 0, 0)
+        y = self.top
+        for line in text.split('\n'):
+            surface = text_cache.render(line, self.font, self.color)
+            line_rect = surface.get_rect(center=(self.center_x, y))
+            self._lines.append((surface, line_rect))
+            rect.union_ip(line_rect)
+            y += self.line_height
+        self.rect = rect
+        self.dirty = True
+
+    def draw(self, surface):
+        for line_surface, line_rect in self._lines:
+            surface.blit(line_surface, line_rect)
+
+# Pre-rendered surface, e.g. a camera or depth image; hidden while surface is None
+class ImageView(Widget):
+    clip_safe = True
+
+    def __init__(self, pos, surface=None):
+        self.pos = pos
+        self.surface = None
+        super().__init__((pos, (0, 0)))
+        self.visible = False
+        self.set_surface(surface)
+
+    def set_surface(self, surface):
+        if surface is self.surface:
+            return
+        self.surface = surface
+        self.visible = surface is not None
+        if surface is not None:
+            self.rect = surface.get_rect(topleft=self.pos)
+        self.dirty = True
+
+    def draw(self, surface):
+        surface.blit(self.surface, self.rect)
+
+# Filled rectangle, e.g. a backdrop behind a row of buttons
+class Panel(Widget):
+    clip_safe = True
+
+    def __init__(self, rect, color=BLACK):
+        super().__init__(rect)
+        self.color = color
+
+    def draw(self, surface):
+        pygame.draw.rect(surface, self.color, self.rect)
+
+# Rectangular or round button with a centered label
+class Button(Widget):
+    def __init__(self, rect, label, font, shape='rect', fill=NAVY_BLUE, border=LIGHT_BLUE,
+                 border_width=2, border_radius=0, text_color=WHITE):
+        self.shape_rect = pygame.Rect(rect)
+        self.label = label
+        self.font = font
+        self.shape = shape
+        self.fill = fill
+        self.border = border
+        self.border_width = border_width
+        self.border_radius = border_radius
+        self.text_color = text_color
+        self._text = None
+        super().__init__(self._layout())
+
+    # Round button from a center and radius
+    @classmethod
+    def circle(cls, center, radius, label, font, **style):
+        rect = pygame.Rect(center[0] - radius, center[1] - radius, radius * 2, radius * 2)
+        return cls(rect, label, font, shape='circle', **style)
+
+    @property
+    def center(self):
+        return self.shape_rect.center
+
+    def _layout(self):
+        self._text = text_cache.render(self.label, self.font, self.text_color)
+        # Leave a pixel of slack around circles, which can spill past their box
+        rect = self.shape_rect.inflate(2, 2)
+        return rect.union(self._text.get_rect(center=self.shape_rect.center))
+
+    def set_label(self, label):
+        if label != self.label:
+            self.label = label
+            self.rect = self._layout()
+            self.dirty = True
+
+    def draw(self, surface):
+        if self.shape == 'circle':
+            radius = self.shape_rect.width // 2
+            pygame.draw.circle(surface, self.fill, self.center, radius)
+            pygame.draw.circle(surface, self.border, self.center, radius, self.border_width)
+        else:
+            pygame.draw.rect(surface, self.fill, self.shape_rect, border_radius=self.border_radius)
+            pygame.draw.rect(surface, self.border, self.shape_rect, self.border_width,
+                             border_radius=self.border_radius)
+        surface.blit(self._text, self._text.get_rect(center=self.center))
+
+# Circle that follows a fingertip; hidden while pos is None
+class Cursor(Widget):
+    def __init__(self, radius, color, width=0):
+        self.radius = radius
+        self.color = color
+        self.width = width
+        self.pos = None
+        super().__init__((0, 0, 0, 0))
+        self.visible = False
+
+    def move(self, pos):
+        if pos == self.pos:
+            return
+        self.pos = pos
+        self.visible = pos is not None
+        if pos is not None:
+            size = self.radius * 2 + 3
+            self.rect = pygame.Rect(pos[0] - self.radius - 1, pos[1] - self.radius - 1, size, size)
+        self.dirty = True
+
+    def draw(self, surface):
+        pygame.draw.circle(surface, self.color, self.pos, self.radius, self.width)
+
+class RenderLayer:
+    def __init__(self, screen, background=BLACK):
+        self.screen = screen
+        self.background = background
+        self.widgets = []
+        self.overlays = []  # Callables drawn on top every frame, returning the rect they covered
+        self._pending_rects = []
+        self._full_redraw = True
+
+    # Widgets are drawn in the order they are added; before= inserts them
+    # underneath an existing widget instead of on top
+    def add(self, *widgets, before=None):
+        index = self.widgets.index(before) if before is not None else len(self.widgets)
+        for widget in widgets:
+            widget.dirty = True
+            self.widgets.insert(index, widget)
+            index += 1
+        return widgets[0] if len(widgets) == 1 else widgets
+
+    def remove(self, widget):
+        self.widgets.remove(widget)
+        if widget.drawn_rect:
+            self.invalidate(widget.drawn_rect)
+
+    def add_overlay(self, draw):
+        self.overlays.append(draw)
+
+    # Force a repaint of rect, or of the whole screen when rect is None (e.g.
+    # after another loop has drawn over it)
+    def invalidate(self, rect=None):
+        if rect is None:
+            self._full_redraw = True
+        else:
+            self._pending_rects.append(pygame.Rect(rect))
+
+    def _collect_dirty_rects(self):
+        rects = self._pending_rects
+        self._pending_rects = []
+        for widget in self.widgets:
+            if widget.dirty:
+                if widget.drawn_rect:
+                    rects.append(widget.drawn_rect)
+                if widget.visible:
+                    rects.append(widget.rect)
+        return rects
+
+    # Clip to the screen and union overlapping rects so no pixel is painted twice
+    def _merge_rects(self, rects):
+        screen_rect = self.screen.get_rect()
+        merged = []
+        for rect in rects:
+            rect = rect.clip(screen_rect)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    # Grow the regions until every widget that isn't clip_safe lies either
+    # completely inside or completely outside each of them
+    def _expand_rects(self, rects):
+        screen_rect = self.screen.get_rect()
+        while True:
+            extra = [widget.rect.clip(screen_rect) for widget in self.widgets
+                     if widget.visible and not widget.clip_safe
+                     for rect in rects
+                     if widget.rect.colliderect(rect) and not rect.contains(widget.rect.clip(screen_rect))]
+            if not extra:
+                return rects
+            rects = self._merge_rects(rects + extra)
+
+    # Repaint what changed and return the list of rects that need presenting
+    # (the whole screen after a full redraw)
+    def render(self):
+        screen = self.screen
+        if self._full_redraw:
+            self._pending_rects = []
+            screen.fill(self.background)
+            for widget in self.widgets:
+                if widget.visible:
+                    widget.draw(screen)
+            rects = [screen.get_rect()]
+        else:
+            rects = self._expand_rects(self._merge_rects(self._collect_dirty_rects()))
+            for rect in rects:
+                screen.set_clip(rect)
+                screen.fill(self.background, rect)
+                for widget in self.widgets:
+                    if widget.visible and widget.rect.colliderect(rect):
+                        widget.draw(screen)
+            screen.set_clip(None)
+
+        for widget in self.widgets:
+            if widget.dirty or self._full_redraw:
+                widget.dirty = False
+                widget.drawn_rect = widget.rect.copy() if widget.visible else None
+        self._full_redraw = False
+
+        # Overlays are repainted every frame; whatever they covered is
+        # restored from the widgets underneath on the next one
+        for draw in self.overlays:
+            rect = draw(screen)
+            if rect:
+                rects.append(rect)
+                self._pending_rects.append(rect)
+        return rects
+
+    def present(self):
+        full_redraw = self._full_redraw
+        rects = self.render()
+        if full_redraw:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)